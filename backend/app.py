@@ -1,9 +1,13 @@
 
-from flask import Flask, send_from_directory
+from flask import Flask
 from config import PORT
 from routes.source import source_bp
 from routes.assistant import assistant_bp
-import os
+from routes.metrics import metrics_bp
+from routes.health import health_bp
+from routes.uploads import uploads_bp
+from services.jobs import job_queue
+from services.warmup import source_warmer
 from flask_cors import CORS
 from dotenv import load_dotenv
 
@@ -13,14 +17,16 @@ app = Flask(__name__)
 CORS(app)
 app.url_map.strict_slashes = False
 
-@app.route('/uploads/<path:filename>')
-
-def uploaded_file(filename):
-    """Serves a file from the upload directory."""
-    return send_from_directory(os.path.join(app.root_path, 'uploads'), filename)
-
 app.register_blueprint(source_bp, url_prefix='/source')
 app.register_blueprint(assistant_bp, url_prefix='/assistant')
+app.register_blueprint(metrics_bp)
+app.register_blueprint(health_bp)
+app.register_blueprint(uploads_bp)
+
+job_queue.resume()
+
+if source_warmer.enabled:
+    source_warmer.start()
 
 if __name__ == '__main__':
     app.run(debug=False, port=PORT)
\ No newline at end of file
@@ -0,0 +1,88 @@
+import random
+from pathlib import Path
+from typing import Dict, List
+from benchmarks.fakes import FAKE_IMAGE_HEADER
+
+SIZES = {
+    "small": {"pages": 5, "sentences_per_page": 25, "mcq": 5, "short": 5},
+    "medium": {"pages": 25, "sentences_per_page": 30, "mcq": 20, "short": 20},
+    "large": {"pages": 100, "sentences_per_page": 35, "mcq": 75, "short": 75},
+}
+
+TOPICS = [
+    "photosynthesis", "mitochondria", "plate tectonics", "the water cycle", "electric circuits", "cell division",
+    "the french revolution", "supply and demand", "chemical bonding", "newton's laws", "the nervous system",
+    "volcanoes", "ecosystems", "the industrial revolution", "probability", "climate zones", "genetics",
+    "the solar system", "acids and bases", "world war one", "magnetism", "the digestive system", "erosion",
+]
+VERBS = ["explains", "describes", "controls", "produces", "depends on", "changes", "releases", "absorbs", "measures"]
+NOUNS = [
+    "energy", "pressure", "temperature", "the population", "the market", "the membrane", "the current", "the climate",
+    "the structure", "the reaction", "the government", "the orbit", "the signal", "the soil", "the enzyme",
+]
+
+def _sentence(rng: random.Random, topic: str) -> str:
+    return f"In {topic}, {rng.choice(NOUNS)} {rng.choice(VERBS)} {rng.choice(NOUNS)} over {rng.randint(2, 90)} units."
+
+def source_pages(size: str, seed: int = 0) -> Dict[str, str]:
+    """Returns the OCR text of every page of a synthetic source, keyed by image file name."""
+    spec = SIZES[size]
+    rng = random.Random(f"source:{size}:{seed}")
+    pages = {}
+    for page in range(spec["pages"]):
+        topic = TOPICS[page % len(TOPICS)]
+        lines = [f"Chapter {page + 1}: {topic.title()}"]
+        lines.extend(_sentence(rng, topic) for _ in range(spec["sentences_per_page"]))
+        pages[f"page_{page + 1:03d}.png"] = "\n".join(lines)
+    return pages
+
+def worksheet(size: str, seed: int = 0) -> str:
+    """Returns a cleanly numbered worksheet with a multiple-choice and a short-answer section."""
+    spec = SIZES[size]
+    rng = random.Random(f"worksheet:{size}:{seed}")
+    lines = ["Part A - Multiple Choice"]
+    number = 1
+    for _ in range(spec["mcq"]):
+        topic = rng.choice(TOPICS)
+        lines.append(f"{number}. Which of the following best describes {topic}?")
+        for letter in "ABCD":
+            lines.append(f"{letter}) {rng.choice(NOUNS)} {rng.choice(VERBS)} {rng.choice(NOUNS)}")
+        number += 1
+    lines.append("Part B - Short Answer")
+    for _ in range(spec["short"]):
+        lines.append(f"{number}. Explain how {rng.choice(NOUNS)} {rng.choice(VERBS)} {rng.choice(NOUNS)} in {rng.choice(TOPICS)}.")
+        number += 1
+    return "\n".join(lines)
+
+def write_fake_image(path: Path, text: str) -> None:
+    """Writes a synthetic image whose 'OCR text' is read back by FakeOCR."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(FAKE_IMAGE_HEADER + text.encode('utf-8'))
+
+def write_source(source_name: str, size: str, seed: int = 0) -> List[str]:
+    """Creates uploads/sources/<source_name> with the synthetic pages of a source size."""
+    source_dir = Path(f"uploads/sources/{source_name}")
+    pages = source_pages(size, seed)
+    for file, text in pages.items():
+        write_fake_image(source_dir / file, text)
+    return list(pages)
+
+def write_worksheet_images(directory: Path, size: str, seed: int = 0, questions_per_image: int = 15) -> List[Path]:
+    """Splits the worksheet of a size over several synthetic images, as a student would photograph it."""
+    lines = worksheet(size, seed).splitlines()
+    paths = []
+    chunk: List[str] = []
+    questions = 0
+    for line in lines:
+        if line[:1].isdigit():
+            questions += 1
+            if questions > questions_per_image and chunk:
+                paths.append(directory / f"worksheet_{len(paths) + 1:02d}.png")
+                write_fake_image(paths[-1], "\n".join(chunk))
+                chunk, questions = [], 1
+        chunk.append(line)
+    if chunk:
+        paths.append(directory / f"worksheet_{len(paths) + 1:02d}.png")
+        write_fake_image(paths[-1], "\n".join(chunk))
+    return paths
@@ -0,0 +1,200 @@
+import ast
+import hashlib
+import json
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from services.context_builder import estimate_tokens
+from services.question_parser import parse_questions
+
+FAKE_IMAGE_HEADER = b"FAKE-IMAGE\n"
+
+class ProviderStats:
+    """
+    Thread-safe counters of the calls made to the fake providers.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {}
+
+    def add(self, **amounts: int) -> None:
+        with self._lock:
+            for name, amount in amounts.items():
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    def next_call(self, name: str) -> int:
+        """Counts one call and returns its sequence number."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+            return self.counters[name]
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counters)
+
+def _should_fail(seed: int, kind: str, call_number: int, failure_rate: float) -> bool:
+    """Decides deterministically from the call sequence number whether an injected failure happens."""
+    if failure_rate <= 0:
+        return False
+    digest = hashlib.sha256(f"{seed}:{kind}:{call_number}".encode('utf-8')).digest()
+    return int.from_bytes(digest[:4], 'big') / 2 ** 32 < failure_rate
+
+def _simulate(latency_seconds: float, tokens: int, tokens_per_second: float) -> None:
+    delay = latency_seconds + (tokens / tokens_per_second if tokens_per_second > 0 else 0)
+    if delay > 0:
+        time.sleep(delay)
+
+def _section(prompt: str, title: str) -> Optional[str]:
+    """Returns the text between a prompt heading and the next '---' rule."""
+    match = re.search(re.escape(title) + r"\s*-{3,}[ \t]*\n(.*?)\n[ \t]*-{3,}[ \t]*\n", prompt, re.DOTALL)
+    return match.group(1) if match else None
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic stand-in for the chat model. Detection prompts are answered with the local question parser,
+    answer prompts with a fixed-length answer per question, anything else with plain text.
+    Latency is `latency_seconds` plus the completion tokens at `tokens_per_second`.
+    """
+    model: str = "fake-llm"
+    latency_seconds: float = 0.0
+    tokens_per_second: float = 0.0
+    failure_rate: float = 0.0
+    answer_words: int = 60
+    seed: int = 0
+    stats: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                  **kwargs: Any) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        call_number = self.stats.next_call("llm_calls")
+        if _should_fail(self.seed, "llm", call_number, self.failure_rate):
+            self.stats.add(llm_failures=1)
+            raise RuntimeError("Injected LLM failure")
+
+        content = self._respond(prompt)
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = estimate_tokens(content)
+        self.stats.add(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        _simulate(self.latency_seconds, completion_tokens, self.tokens_per_second)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    def _respond(self, prompt: str) -> str:
+        if "QUESTIONS TO ANSWER" in prompt:
+            return self._answer(prompt)
+        if "CONTENT TO ANALYZE" in prompt:
+            return self._detect(prompt)
+        words = " ".join(["response"] * self.answer_words)
+        return f"Benchmark response based on Source Chunk {{R1}}: {words}"
+
+    def _detect(self, prompt: str) -> str:
+        content = _section(prompt, "**CONTENT TO ANALYZE:**") or ""
+        detected = _section(prompt, "**ALREADY DETECTED QUESTIONS (DO NOT EXTRACT THESE AGAIN):**") or "[]"
+        batch_match = re.search(r"up to \*\*(\d+)\*\*", prompt)
+        batch_size = int(batch_match.group(1)) if batch_match else 15
+
+        try:
+            already = {(q.get("section"), q.get("question_number")) for q in json.loads(detected)}
+        except ValueError:
+            already = set()
+        questions, _ = parse_questions(content)
+        remaining = [q for q in questions if (q["section"], q["question_number"]) not in already]
+        return json.dumps({"questions": remaining[:batch_size], "is_more_questions": len(remaining) > batch_size})
+
+    def _answer(self, prompt: str) -> str:
+        questions_text = _section(prompt, "QUESTIONS TO ANSWER (JSON format):") or "[]"
+        try:
+            questions = ast.literal_eval(questions_text.strip())
+        except (ValueError, SyntaxError):
+            questions = []
+        labels = re.findall(r"Source Chunk \{(R[^}]*)\}", prompt.split("QUESTIONS TO ANSWER")[0])
+        source = f"Source Chunk {{{labels[0]}}}" if labels else "No source"
+        words = " ".join(["answer"] * self.answer_words)
+
+        answers = []
+        for question in questions:
+            options = question.get("options")
+            answers.append({
+                "question_number": str(question.get("question_number")),
+                "question": question.get("question") or "",
+                "answer": words,
+                "source": source,
+                "section": question.get("section") or "Uncategorized",
+                "question_type": "Multiple Choice" if options else "Short Answer",
+                "options_with_answer": ", ".join([f"{options[0]} ✓"] + options[1:]) if options else None,
+            })
+        return json.dumps({"answers": answers}, ensure_ascii=False)
+
+class FakeEmbeddings(Embeddings):
+    """
+    Deterministic hashed bag-of-words embeddings. Each request of up to `max_batch_size` texts counts as one call
+    and takes `latency_seconds` plus `seconds_per_text` per text.
+    """
+    def __init__(self, stats: ProviderStats, dimension: int = 256, latency_seconds: float = 0.0,
+                 seconds_per_text: float = 0.0, failure_rate: float = 0.0, max_batch_size: int = 50, seed: int = 0):
+        self.stats = stats
+        self.dimension = dimension
+        self.latency_seconds = latency_seconds
+        self.seconds_per_text = seconds_per_text
+        self.failure_rate = failure_rate
+        self.max_batch_size = max_batch_size
+        self.seed = seed
+        self.model = f"fake-embeddings-{dimension}"
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.md5(word.encode('utf-8')).digest()
+            vector[int.from_bytes(digest[:4], 'big') % self.dimension] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def _embed(self, texts: List[str], model_type: str = "passage") -> List[List[float]]:
+        vectors = []
+        for i in range(0, len(texts), self.max_batch_size):
+            batch = texts[i:i + self.max_batch_size]
+            call_number = self.stats.next_call("embedding_calls")
+            if _should_fail(self.seed, "embedding", call_number, self.failure_rate):
+                self.stats.add(embedding_failures=1)
+                raise RuntimeError("Injected embedding failure")
+            self.stats.add(embedded_texts=len(batch), embedding_tokens=sum(estimate_tokens(text) for text in batch))
+            _simulate(self.latency_seconds + self.seconds_per_text * len(batch), 0, 0)
+            vectors.extend(self._vector(text) for text in batch)
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, model_type="passage")
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], model_type="query")[0]
+
+class FakeOCR:
+    """
+    OCR stand-in that reads the text stored in synthetic images written by `benchmarks.corpus`.
+    """
+    def __init__(self, stats: ProviderStats, latency_seconds: float = 0.0, failure_rate: float = 0.0, seed: int = 0):
+        self.stats = stats
+        self.latency_seconds = latency_seconds
+        self.failure_rate = failure_rate
+        self.seed = seed
+
+    def ocr_file(self, file_path: str) -> str:
+        call_number = self.stats.next_call("ocr_calls")
+        if _should_fail(self.seed, "ocr", call_number, self.failure_rate):
+            self.stats.add(ocr_failures=1)
+            raise RuntimeError("Injected OCR failure")
+        _simulate(self.latency_seconds, 0, 0)
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        if FAKE_IMAGE_HEADER in data:
+            return data.split(FAKE_IMAGE_HEADER, 1)[1].decode('utf-8')
+        return ""
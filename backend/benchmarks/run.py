@@ -0,0 +1,214 @@
+"""
+Offline benchmarks for the assistant pipeline. Every run uses the deterministic stand-ins from
+`benchmarks.fakes` instead of NVIDIA and OCR.space, and works in a fresh temporary directory so the
+OCR, LLM and embedding caches start cold.
+
+Run from the backend folder:
+
+    python -m benchmarks.run --sizes small,medium --output benchmark.json
+    python -m benchmarks.run --output after.json --compare benchmark.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+SCHEMA_VERSION = 1
+COUNTERS = [
+    "llm_calls", "llm_failures", "prompt_tokens", "completion_tokens",
+    "embedding_calls", "embedding_failures", "embedded_texts", "embedding_tokens",
+    "ocr_calls", "ocr_failures",
+]
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the offline assistant benchmarks.")
+    parser.add_argument("--sizes", default="small,medium", help="Comma-separated corpus sizes: small, medium, large.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds added to every LLM call.")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=0.0, help="Completion throughput; 0 disables.")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--embedding-latency", type=float, default=0.02, help="Seconds added to every embedding request.")
+    parser.add_argument("--embedding-seconds-per-text", type=float, default=0.0)
+    parser.add_argument("--embedding-failure-rate", type=float, default=0.0)
+    parser.add_argument("--ocr-latency", type=float, default=0.05, help="Seconds added to every OCR call.")
+    parser.add_argument("--ocr-failure-rate", type=float, default=0.0)
+    parser.add_argument("--scenarios", default="", help="Comma-separated scenario names to run; all by default.")
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--compare", help="Print the change against an earlier JSON result file.")
+    return parser.parse_args(argv)
+
+def measure(stats, scenario: str, size: str, fn: Callable[[], Any],
+            summarize: Optional[Callable[[Any], Dict[str, Any]]] = None) -> Tuple[Any, Dict[str, Any]]:
+    """Runs one scenario and records its wall time and the provider calls it made."""
+    before = stats.snapshot()
+    start = time.perf_counter()
+    result = None
+    error = None
+    try:
+        result = fn()
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    wall_seconds = time.perf_counter() - start
+    after = stats.snapshot()
+
+    record = {"scenario": scenario, "size": size, "wall_seconds": round(wall_seconds, 4), "error": error}
+    record.update({name: after.get(name, 0) - before.get(name, 0) for name in COUNTERS})
+    if summarize is not None and error is None:
+        record.update(summarize(result))
+    print(f"{size:>6} {scenario:<28} {wall_seconds:8.3f}s  llm={record['llm_calls']} "
+          f"prompt_tokens={record['prompt_tokens']} embed={record['embedding_calls']} ocr={record['ocr_calls']}"
+          + (f"  error={error}" if error else ""))
+    return result, record
+
+def summarize_detection(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {"questions": len(result.get("questions", [])), "result_error": result.get("error")}
+
+def summarize_answers(result: Dict[str, Any]) -> Dict[str, Any]:
+    answers = result.get("answers", [])
+    failed = [answer for answer in answers if str(answer.get("answer", "")).startswith("Error processing")]
+    return {"answers": len(answers), "failed_answers": len(failed), "result_error": result.get("error")}
+
+def summarize_response(response) -> Dict[str, Any]:
+    return {"status_code": response.status_code}
+
+def run_size(size: str, args: argparse.Namespace, stats, selected: List[str]) -> List[Dict[str, Any]]:
+    from benchmarks.corpus import write_source, worksheet, write_worksheet_images
+    from services.assistant import HomeworkAnswerAssistant
+    from services.llm_cache import bypass_llm_cache
+
+    records = []
+    source_name = f"bench-{size}-{args.seed}"
+    write_source(source_name, size, args.seed)
+    content = worksheet(size, args.seed)
+
+    def run(scenario: str, fn: Callable[[], Any], summarize=None) -> Any:
+        if selected and scenario not in selected:
+            return None
+        result, record = measure(stats, scenario, size, fn, summarize)
+        records.append(record)
+        return result
+
+    assistant = run("setup_knowledge_base_cold", lambda: HomeworkAnswerAssistant(source_name))
+    run("setup_knowledge_base_warm", lambda: HomeworkAnswerAssistant(source_name))
+    assistant = assistant or HomeworkAnswerAssistant(source_name)
+
+    detection = run("detect_questions", lambda: assistant.detect_questions(content), summarize_detection)
+    run("detect_questions_llm", lambda: assistant.detect_questions(content, user_corrections="Keep the original numbering."),
+        summarize_detection)
+    detection = detection or assistant.detect_questions(content)
+
+    run("answer_all_questions_cold", lambda: assistant.answer_all_questions(detection, content), summarize_answers)
+    run("answer_all_questions_warm", lambda: assistant.answer_all_questions(detection, content), summarize_answers)
+
+    def free_form():
+        with bypass_llm_cache():
+            return assistant.answer_single_response("Summarise the main ideas of this chapter.")
+    run("answer_single_response", free_form)
+
+    from app import app
+    client = app.test_client()
+    bypass = {"X-Bypass-Cache": "1"}
+    run("route_detect", lambda: client.post(f"/assistant/{source_name}/detect", data={"text": content}, headers=bypass),
+        summarize_response)
+    run("route_answer", lambda: client.post(
+        f"/assistant/{source_name}/answer",
+        json={"detection_result": detection, "text_input": content},
+        headers=bypass
+    ), summarize_response)
+
+    image_paths = write_worksheet_images(Path(f"worksheets/{size}"), size, args.seed)
+
+    def ask_with_images():
+        files = [open(path, 'rb') for path in image_paths]
+        try:
+            return client.post(
+                f"/assistant/{source_name}/ask",
+                data={"file": [(f, path.name) for f, path in zip(files, image_paths)]},
+                content_type="multipart/form-data",
+                headers=bypass
+            )
+        finally:
+            for f in files:
+                f.close()
+    run("route_ask", ask_with_images, summarize_response)
+    return records
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Prints the change in wall time and provider usage per scenario against a baseline run."""
+    previous = {(record["size"], record["scenario"]): record for record in baseline.get("results", [])}
+    print(f"\n{'size':>6} {'scenario':<28} {'wall':>10} {'change':>8} {'llm':>6} {'tokens':>8} {'embed':>6} {'ocr':>5}")
+    for record in results["results"]:
+        before = previous.get((record["size"], record["scenario"]))
+        if before is None:
+            print(f"{record['size']:>6} {record['scenario']:<28} {record['wall_seconds']:9.3f}s {'new':>8}")
+            continue
+        change = (record["wall_seconds"] - before["wall_seconds"]) / before["wall_seconds"] * 100 if before["wall_seconds"] else 0.0
+        print(
+            f"{record['size']:>6} {record['scenario']:<28} {record['wall_seconds']:9.3f}s {change:+7.1f}% "
+            f"{record['llm_calls'] - before['llm_calls']:+6d} {record['prompt_tokens'] - before['prompt_tokens']:+8d} "
+            f"{record['embedding_calls'] - before['embedding_calls']:+6d} {record['ocr_calls'] - before['ocr_calls']:+5d}"
+        )
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    args = parse_args(argv)
+    output_path = Path(args.output).resolve() if args.output else None
+    compare_path = Path(args.compare).resolve() if args.compare else None
+    sizes = [size.strip() for size in args.sizes.split(",") if size.strip()]
+    selected = [scenario.strip() for scenario in args.scenarios.split(",") if scenario.strip()]
+
+    # Services resolve their data and upload folders against the working directory at import time.
+    sys.path.insert(0, str(BACKEND_DIR))
+    work_dir = tempfile.mkdtemp(prefix="assistant-benchmark-")
+    os.chdir(work_dir)
+
+    from benchmarks.fakes import ProviderStats, FakeChatModel, FakeEmbeddings, FakeOCR
+    from services.providers import set_provider_factories
+
+    stats = ProviderStats()
+    set_provider_factories(
+        llm=lambda: FakeChatModel(
+            latency_seconds=args.llm_latency,
+            tokens_per_second=args.llm_tokens_per_second,
+            failure_rate=args.llm_failure_rate,
+            seed=args.seed,
+            stats=stats,
+        ),
+        embeddings=lambda: FakeEmbeddings(
+            stats,
+            latency_seconds=args.embedding_latency,
+            seconds_per_text=args.embedding_seconds_per_text,
+            failure_rate=args.embedding_failure_rate,
+            seed=args.seed,
+        ),
+        ocr=lambda: FakeOCR(stats, latency_seconds=args.ocr_latency, failure_rate=args.ocr_failure_rate, seed=args.seed),
+    )
+
+    print(f"Benchmark working directory: {work_dir}")
+    records = []
+    for size in sizes:
+        records.extend(run_size(size, args, stats, selected))
+
+    results = {
+        "schema_version": SCHEMA_VERSION,
+        "settings": {key: value for key, value in sorted(vars(args).items()) if key not in ("output", "compare")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "results": records,
+    }
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Results written to {output_path}")
+    if compare_path:
+        with open(compare_path, 'r', encoding='utf-8') as f:
+            compare(results, json.load(f))
+    return results
+
+if __name__ == '__main__':
+    main()
@@ -4,4 +4,42 @@ load_dotenv()
 
 PORT = os.getenv('PORT', 5000)
 OCR_SPACE_API_KEY = os.getenv('OCR_SPACE_API_KEY')
-NVIDIA_API_KEY = os.getenv('NVIDIA_API_KEY')
\ No newline at end of file
+NVIDIA_API_KEY = os.getenv('NVIDIA_API_KEY')
+ASSISTANT_CACHE_MAX_INSTANCES = int(os.getenv('ASSISTANT_CACHE_MAX_INSTANCES', 8))
+ASSISTANT_CACHE_MAX_MB = int(os.getenv('ASSISTANT_CACHE_MAX_MB', 1024))
+ANSWER_CONCURRENCY = int(os.getenv('ANSWER_CONCURRENCY', 4))
+OCR_CONCURRENCY = int(os.getenv('OCR_CONCURRENCY', 4))
+OCR_TIMEOUT_SECONDS = float(os.getenv('OCR_TIMEOUT_SECONDS', 60))
+OCR_MAX_RETRIES = int(os.getenv('OCR_MAX_RETRIES', 3))
+OCR_RETRY_BASE_DELAY = float(os.getenv('OCR_RETRY_BASE_DELAY', 1.0))
+OCR_ENGINE = int(os.getenv('OCR_ENGINE', 2))
+OCR_CACHE_MAX_MB = int(os.getenv('OCR_CACHE_MAX_MB', 256))
+DETECTION_MODE = os.getenv('DETECTION_MODE', 'segmented')
+DETECTION_SEGMENT_CHARS = int(os.getenv('DETECTION_SEGMENT_CHARS', 6000))
+DETECTION_CONCURRENCY = int(os.getenv('DETECTION_CONCURRENCY', 4))
+LOCAL_DETECTION_MIN_CONFIDENCE = float(os.getenv('LOCAL_DETECTION_MIN_CONFIDENCE', 0.8))
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', 60))
+LLM_CACHE_MAX_MB = int(os.getenv('LLM_CACHE_MAX_MB', 256))
+LLM_CACHE_TTL_SECONDS = float(os.getenv('LLM_CACHE_TTL_SECONDS', 0))
+CONTEXT_MAX_TOKENS = int(os.getenv('CONTEXT_MAX_TOKENS', 6000))
+CONTEXT_MMR_LAMBDA = float(os.getenv('CONTEXT_MMR_LAMBDA', 0.7))
+SINGLE_RESPONSE_MAX_TOKENS = int(os.getenv('SINGLE_RESPONSE_MAX_TOKENS', 6000))
+SINGLE_RESPONSE_STUFF_MAX_TOKENS = int(os.getenv('SINGLE_RESPONSE_STUFF_MAX_TOKENS', 0))
+HISTORY_MAX_ENTRIES_PER_SOURCE = int(os.getenv('HISTORY_MAX_ENTRIES_PER_SOURCE', 200))
+HISTORY_INLINE_MAX_BYTES = int(os.getenv('HISTORY_INLINE_MAX_BYTES', 4096))
+WARMUP_ON_START = os.getenv('WARMUP_ON_START', 'false').lower() in ('1', 'true', 'yes')
+WARMUP_CONCURRENCY = int(os.getenv('WARMUP_CONCURRENCY', 2))
+OCR_PREPROCESS = os.getenv('OCR_PREPROCESS', 'true').lower() in ('1', 'true', 'yes')
+OCR_TARGET_DPI = int(os.getenv('OCR_TARGET_DPI', 200))
+OCR_JPEG_QUALITY = int(os.getenv('OCR_JPEG_QUALITY', 80))
+OCR_PREPROCESS_WORKERS = int(os.getenv('OCR_PREPROCESS_WORKERS', 2))
+OCR_PREPROCESS_TIMEOUT_SECONDS = float(os.getenv('OCR_PREPROCESS_TIMEOUT_SECONDS', 30))
+THUMBNAIL_SIZES = [int(size) for size in os.getenv('THUMBNAIL_SIZES', '160,320,640').split(',') if size.strip()]
+THUMBNAIL_QUALITY = int(os.getenv('THUMBNAIL_QUALITY', 75))
+UPLOADS_MAX_AGE_SECONDS = int(os.getenv('UPLOADS_MAX_AGE_SECONDS', 31536000))
+OUTPUT_REPAIR_RETRIES = int(os.getenv('OUTPUT_REPAIR_RETRIES', 1))
+LLM_MAX_TOKENS = int(os.getenv('LLM_MAX_TOKENS', 4096))
+BATCH_OUTPUT_BUDGET_RATIO = float(os.getenv('BATCH_OUTPUT_BUDGET_RATIO', 0.75))
+BATCH_INPUT_TOKEN_BUDGET = int(os.getenv('BATCH_INPUT_TOKEN_BUDGET', 4000))
+BATCH_MAX_QUESTIONS = int(os.getenv('BATCH_MAX_QUESTIONS', 25))
@@ -1,25 +1,178 @@
-from flask import Blueprint, Response, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context, g
 import os
 from werkzeug.utils import secure_filename
-from services.assistant import HomeworkAnswerAssistant
+from services.registry import assistant_registry
+from services.jobs import job_queue, JobStore, check_lease
+from services.llm_cache import llm_cache, llm_cache_bypass, bypass_llm_cache
+from services.ocr import ocr_cache
+from services.history import history_store
 from services.ocr import ocr_multiple_files, combine_ocr_results
 import tempfile
 import json
-from typing import List
+from typing import Any, Dict, Iterator, List
 
 assistant_bp = Blueprint("Assistant", __name__)
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff'}
 MAX_FILES = 10
 
+def bypass_cache_requested() -> bool:
+    """
+    A request bypasses cached LLM responses with an `X-Bypass-Cache: 1` header or a truthy `bypass_cache` field.
+    """
+    flag = request.headers.get('X-Bypass-Cache') or request.form.get('bypass_cache')
+    if not flag and request.is_json:
+        flag = (request.get_json(silent=True) or {}).get('bypass_cache')
+    return str(flag).lower() in ('1', 'true', 'yes')
+
+@assistant_bp.before_request
+def apply_cache_bypass():
+    g.llm_cache_bypass_token = llm_cache_bypass.set(bypass_cache_requested())
+
+@assistant_bp.teardown_request
+def reset_cache_bypass(exc=None):
+    token = g.pop('llm_cache_bypass_token', None)
+    if token is not None:
+        try:
+            llm_cache_bypass.reset(token)
+        except ValueError:
+            pass
+
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def ocr_uploaded_files(files) -> str:
+    """
+    Saves uploaded images to temporary files, OCRs them and returns the combined text.
+    """
+    ocr_content = ""
+
+    if files and files[0].filename:
+        temp_file_paths = []
+        try:
+            for file in files:
+                if file and file.filename and allowed_file(file.filename):
+                    temp_fd, temp_path = tempfile.mkstemp(suffix=os.path.splitext(file.filename)[1])
+                    os.close(temp_fd)
+                    file.save(temp_path)
+                    temp_file_paths.append(temp_path)
+            if temp_file_paths:
+                ocr_results = ocr_multiple_files(temp_file_paths)
+                ocr_content = combine_ocr_results(ocr_results)
+                if len(temp_file_paths) > 1:
+                    ocr_content = "**NOTE: Images may not be in any particular order.**\n\n" + ocr_content
+        finally:
+            for temp_path in temp_file_paths:
+                try:
+                    os.unlink(temp_path)
+                except:
+                    pass
+
+    return ocr_content
+
+def answer_user_input(text_input: str, ocr_content: str) -> str:
+    """Builds the user side of a chat history entry for /answer."""
+    user_input = f"Text: {text_input}\n" if text_input else ""
+    if ocr_content:
+        ocr_preview = ocr_content[:300] + "..." if len(ocr_content) > 300 else ocr_content
+        user_input += f"OCR Content: {ocr_preview}"
+    return user_input
+
+def ask_user_input(text_input: str, ocr_content: str, user_corrections: str) -> str:
+    """Builds the user side of a chat history entry for /ask."""
+    user_input = f"Text: {text_input}\n" if text_input else ""
+    if ocr_content:
+        user_input += f"OCR Content: {ocr_content[:200]}..." if len(ocr_content) > 200 else f"OCR Content: {ocr_content}"
+    if user_corrections:
+        user_input += f"\nUser corrections: {user_corrections}"
+    return user_input
+
+def history_response(result: Dict[str, Any], source_name: str) -> str:
+    """
+    Builds the assistant side of a chat history entry from an answer result.
+    """
+    if result.get("type") == "structured_answers":
+        response = result.get("markdown", "")
+        if not response:
+            sections_summary = result.get("sections_summary", {})
+            sections_text = ", ".join([f"{section}: {count} questions" for section, count in sections_summary.items()])
+            response = f"Answered {result.get('total_questions', 0)} questions from {source_name} ({sections_text})"
+    elif result.get("type") == "single_response":
+        response = result.get("markdown", result.get("response", "Generated response"))
+    else:
+        response = "Generated response"
+    return response
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Formats one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events: Iterator[str]) -> Response:
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def run_answer_job(store: JobStore, job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Background handler for "answer" and "ask" jobs. Detection results and every successful answer batch are
+    persisted as they complete, so a resumed job never repeats finished work.
+    """
+    payload = job["payload"]
+    with bypass_llm_cache(payload.get("bypass_cache", False)):
+        return _run_answer_job(store, job)
+
+def _run_answer_job(store: JobStore, job: Dict[str, Any]) -> Dict[str, Any]:
+    payload = job["payload"]
+    source_name = job["source_name"]
+    ocr_content = payload.get("ocr_content", "")
+    text_input = payload.get("text_input", "")
+    user_corrections = payload.get("user_corrections", "")
+    assistant = assistant_registry.get(source_name)
+
+    detection_result = payload.get("detection_result")
+    if detection_result is None:
+        detection_result = assistant.detect_questions(ocr_content, text_input, user_corrections)
+        if detection_result.get("error"):
+            return detection_result
+        check_lease(job)
+        payload["detection_result"] = detection_result
+        store.update(job["id"], payload=payload)
+
+    if job["kind"] == "ask" and not detection_result.get("questions"):
+        result = assistant.answer_single_response(ocr_content, text_input)
+    else:
+        result = None
+        for event, data in assistant.stream_answers(detection_result, completed_batches=store.get_batches(job["id"])):
+            check_lease(job)
+            if event == "batch" and data["succeeded"]:
+                store.add_batch(job["id"], data["section"], data["question_indices"], data["answers"])
+            elif event == "progress":
+                store.update(job["id"], progress=data)
+            elif event in ("done", "error"):
+                result = data
+
+    check_lease(job)
+    if result and not result.get("error"):
+        if job["kind"] == "ask":
+            user_input = ask_user_input(text_input, ocr_content, user_corrections)
+        else:
+            user_input = answer_user_input(text_input, ocr_content)
+        assistant.add_to_chat_history(user_input, history_response(result, source_name))
+    return result or {"error": "No answers generated"}
+
+job_queue.register("answer", run_answer_job)
+job_queue.register("ask", run_answer_job)
+
+def job_accepted(job_id: str):
+    return jsonify({"job_id": job_id, "status": "queued", "status_url": f"/assistant/jobs/{job_id}"}), 202
+
 @assistant_bp.route("/<source_name>/detect", methods=['POST'])
 def detect_questions(source_name):
     try:
-        assistant = HomeworkAnswerAssistant(source_name=source_name)
+        assistant = assistant_registry.get(source_name)
 
         text_input = request.form.get('text', '').strip()
         user_corrections = request.form.get('user_corrections', '').strip()
@@ -31,28 +184,7 @@ def detect_questions(source_name):
                 "error": f"Maximum {MAX_FILES} files allowed. You uploaded {len(files)} files."
             }), 400
 
-        ocr_content = ""
-
-        if files and files[0].filename:
-            temp_file_paths = []
-            try:
-                for file in files:
-                    if file and file.filename and allowed_file(file.filename):
-                        temp_fd, temp_path = tempfile.mkstemp(suffix=os.path.splitext(file.filename)[1])
-                        os.close(temp_fd)
-                        file.save(temp_path)
-                        temp_file_paths.append(temp_path)
-                if temp_file_paths:
-                    ocr_results = ocr_multiple_files(temp_file_paths)
-                    ocr_content = combine_ocr_results(ocr_results)
-                    if len(temp_file_paths) > 1:
-                        ocr_content = "**NOTE: Images may not be in any particular order.**\n\n" + ocr_content
-            finally:
-                for temp_path in temp_file_paths:
-                    try:
-                        os.unlink(temp_path)
-                    except:
-                        pass
+        ocr_content = ocr_uploaded_files(files)
 
         if not ocr_content and not text_input:
             return jsonify({
@@ -92,42 +224,77 @@ def answer_questions(source_name):
         if not detection_result:
             return jsonify({"error": "No detection result provided"}), 400
 
-        assistant = HomeworkAnswerAssistant(source_name=source_name)
+        assistant = assistant_registry.get(source_name)
         result = assistant.answer_all_questions(detection_result, ocr_content, text_input)
 
         if result.get("error"):
             return jsonify(result), 500
 
-        user_input = f"Text: {text_input}\n" if text_input else ""
-        if ocr_content:
-            ocr_preview = ocr_content[:300] + "..." if len(ocr_content) > 300 else ocr_content
-            user_input += f"OCR Content: {ocr_preview}"
-
-        if result.get("type") == "structured_answers":
-            history_response = result.get("markdown", "")
-            if not history_response:
-                sections_summary = result.get("sections_summary", {})
-                sections_text = ", ".join([f"{section}: {count} questions" for section, count in sections_summary.items()])
-                history_response = f"Answered {result.get('total_questions', 0)} questions from {source_name} ({sections_text})"
-        else:
-            history_response = "Generated response"
-
-        assistant.add_to_chat_history(user_input, history_response)
+        assistant.add_to_chat_history(answer_user_input(text_input, ocr_content), history_response(result, source_name))
 
         return jsonify({
             "type": result.get("type", "answer"),
             "result": result,
             "source_name": source_name,
-            "chat_history_length": len(assistant.get_chat_history())
+            "chat_history_length": history_store.count(source_name)
         })
 
     except Exception as e:
         return jsonify({"error": f"An error occurred during answer generation: {str(e)}"}), 500
 
+@assistant_bp.route("/<source_name>/answer/stream", methods=['POST'])
+def answer_questions_stream(source_name):
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "No JSON data provided"}), 400
+
+    ocr_content = data.get('ocr_content', '')
+    text_input = data.get('text_input', '')
+    detection_result = data.get('detection_result', {})
+
+    if not detection_result:
+        return jsonify({"error": "No detection result provided"}), 400
+
+    def generate():
+        try:
+            assistant = assistant_registry.get(source_name)
+            for event, payload in assistant.stream_answers(detection_result):
+                if event != "done":
+                    yield sse_event(event, payload)
+                    continue
+
+                assistant.add_to_chat_history(answer_user_input(text_input, ocr_content), history_response(payload, source_name))
+                yield sse_event("done", {
+                    "type": payload.get("type", "answer"),
+                    "result": payload,
+                    "source_name": source_name,
+                    "chat_history_length": history_store.count(source_name)
+                })
+        except Exception as e:
+            yield sse_event("error", {"error": f"An error occurred during answer generation: {str(e)}"})
+
+    return sse_response(generate())
+
+@assistant_bp.route("/<source_name>/answer/async", methods=['POST'])
+def answer_questions_async(source_name):
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "No JSON data provided"}), 400
+    if not data.get('detection_result'):
+        return jsonify({"error": "No detection result provided"}), 400
+
+    job_id = job_queue.submit("answer", source_name, {
+        "ocr_content": data.get('ocr_content', ''),
+        "text_input": data.get('text_input', ''),
+        "detection_result": data.get('detection_result'),
+        "bypass_cache": bypass_cache_requested(),
+    })
+    return job_accepted(job_id)
+
 @assistant_bp.route("/<source_name>/ask", methods=['POST'])
 def ask_assistant(source_name):
     try:
-        assistant = HomeworkAnswerAssistant(source_name=source_name)
+        assistant = assistant_registry.get(source_name)
         text_input = request.form.get('text', '').strip()
         user_corrections = request.form.get('user_corrections', '').strip()
         files = request.files.getlist('file')
@@ -135,27 +302,7 @@ def ask_assistant(source_name):
         if len(files) > MAX_FILES:
             return jsonify({"error": f"Maximum {MAX_FILES} files allowed. You uploaded {len(files)} files."}), 400
 
-        ocr_content = ""
-        if files and files[0].filename:
-            temp_file_paths = []
-            try:
-                for file in files:
-                    if file and file.filename and allowed_file(file.filename):
-                        temp_fd, temp_path = tempfile.mkstemp(suffix=os.path.splitext(file.filename)[1])
-                        os.close(temp_fd)
-                        file.save(temp_path)
-                        temp_file_paths.append(temp_path)
-                if temp_file_paths:
-                    ocr_results = ocr_multiple_files(temp_file_paths)
-                    ocr_content = combine_ocr_results(ocr_results)
-                    if len(temp_file_paths) > 1:
-                        ocr_content = "**NOTE: Images may not be in any particular order.**\n\n" + ocr_content
-            finally:
-                for temp_path in temp_file_paths:
-                    try:
-                        os.unlink(temp_path)
-                    except:
-                        pass
+        ocr_content = ocr_uploaded_files(files)
 
         if not ocr_content and not text_input:
             return jsonify({"error": "Please provide either text input or upload image files for OCR processing."}), 400
@@ -164,24 +311,7 @@ def ask_assistant(source_name):
         if result.get("error"):
             return jsonify(result), 500
         
-        user_input = f"Text: {text_input}\n" if text_input else ""
-        if ocr_content:
-            user_input += f"OCR Content: {ocr_content[:200]}..." if len(ocr_content) > 200 else f"OCR Content: {ocr_content}"
-        if user_corrections:
-            user_input += f"\nUser corrections: {user_corrections}"
-
-        if result.get("type") == "structured_answers":
-            history_response = result.get("markdown", "")
-            if not history_response:
-                sections_summary = result.get("sections_summary", {})
-                sections_text = ", ".join([f"{section}: {count} questions" for section, count in sections_summary.items()])
-                history_response = f"Answered {result.get('total_questions', 0)} questions from {source_name} ({sections_text})"
-        elif result.get("type") == "single_response":
-            history_response = result.get("markdown", result.get("response", "Generated response"))
-        else:
-            history_response = "Generated response"
-
-        assistant.add_to_chat_history(user_input, history_response)
+        assistant.add_to_chat_history(ask_user_input(text_input, ocr_content, user_corrections), history_response(result, source_name))
 
         clean_result = {str(k): v for k, v in result.items()}
         response_data = {
@@ -189,7 +319,7 @@ def ask_assistant(source_name):
             "result": clean_result,
             "source_name": source_name,
             "files_processed": len(files) if files and files[0].filename else 0,
-            "chat_history_length": len(assistant.get_chat_history())
+            "chat_history_length": history_store.count(source_name)
         }
 
         json_response = json.dumps(response_data, sort_keys=False)
@@ -200,21 +330,145 @@ def ask_assistant(source_name):
         print(e)
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
+@assistant_bp.route("/<source_name>/ask/stream", methods=['POST'])
+def ask_assistant_stream(source_name):
+    text_input = request.form.get('text', '').strip()
+    user_corrections = request.form.get('user_corrections', '').strip()
+    files = request.files.getlist('file')
+
+    if len(files) > MAX_FILES:
+        return jsonify({"error": f"Maximum {MAX_FILES} files allowed. You uploaded {len(files)} files."}), 400
+
+    try:
+        ocr_content = ocr_uploaded_files(files)
+    except Exception as e:
+        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+
+    if not ocr_content and not text_input:
+        return jsonify({"error": "Please provide either text input or upload image files for OCR processing."}), 400
+
+    files_processed = len(files) if files and files[0].filename else 0
+
+    def generate():
+        try:
+            assistant = assistant_registry.get(source_name)
+            yield sse_event("status", {"message": "Detecting questions"})
+            detection_result = assistant.detect_questions(ocr_content, text_input, user_corrections)
+            if detection_result.get("error"):
+                yield sse_event("error", detection_result)
+                return
+
+            questions = detection_result.get("questions", [])
+            yield sse_event("questions_detected", {
+                "total_questions": len(questions),
+                "sections": list(dict.fromkeys(q.get("section", "Unknown") for q in questions)),
+            })
+
+            result = None
+            if not questions:
+                yield sse_event("status", {"message": "Generating response"})
+                result = assistant.answer_single_response(ocr_content, text_input)
+            else:
+                for event, payload in assistant.stream_answers(detection_result):
+                    if event == "done":
+                        result = payload
+                    else:
+                        yield sse_event(event, payload)
+
+            if not result or result.get("error"):
+                yield sse_event("error", result or {"error": "No answers generated"})
+                return
+
+            assistant.add_to_chat_history(ask_user_input(text_input, ocr_content, user_corrections), history_response(result, source_name))
+            yield sse_event("done", {
+                "type": result.get("type", "answer"),
+                "result": {str(k): v for k, v in result.items()},
+                "source_name": source_name,
+                "files_processed": files_processed,
+                "chat_history_length": history_store.count(source_name)
+            })
+        except Exception as e:
+            print(e)
+            yield sse_event("error", {"error": f"An error occurred: {str(e)}"})
+
+    return sse_response(generate())
+
+@assistant_bp.route("/<source_name>/ask/async", methods=['POST'])
+def ask_assistant_async(source_name):
+    try:
+        text_input = request.form.get('text', '').strip()
+        user_corrections = request.form.get('user_corrections', '').strip()
+        files = request.files.getlist('file')
+
+        if len(files) > MAX_FILES:
+            return jsonify({"error": f"Maximum {MAX_FILES} files allowed. You uploaded {len(files)} files."}), 400
+
+        ocr_content = ocr_uploaded_files(files)
+
+        if not ocr_content and not text_input:
+            return jsonify({"error": "Please provide either text input or upload image files for OCR processing."}), 400
+
+        job_id = job_queue.submit("ask", source_name, {
+            "ocr_content": ocr_content,
+            "text_input": text_input,
+            "user_corrections": user_corrections,
+            "bypass_cache": bypass_cache_requested(),
+        })
+        return job_accepted(job_id)
+
+    except Exception as e:
+        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+
+@assistant_bp.route("/jobs/<job_id>", methods=['GET'])
+def get_job_status(job_id):
+    job = job_queue.store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    response_data = {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "source_name": job["source_name"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+    if job["status"] == "completed":
+        response_data["result"] = job["result"]
+    else:
+        batches = sorted(job_queue.store.get_batches(job_id), key=lambda batch: min(batch["question_indices"]))
+        response_data["partial_answers"] = [answer for batch in batches for answer in batch["answers"]]
+    return jsonify(response_data)
+
+@assistant_bp.route("/cache/stats", methods=['GET'])
+def get_cache_stats():
+    return jsonify({"llm": llm_cache.stats(), "ocr": ocr_cache.stats()})
+
 @assistant_bp.route("/<source_name>/history", methods=['GET'])
 def get_chat_history(source_name):
+    """
+    Returns the newest `limit` exchanges (oldest first). Pass the returned `next_cursor` as `before`
+    to page through older exchanges.
+    """
     try:
-        assistant = HomeworkAnswerAssistant(source_name=source_name)
-        history = assistant.get_chat_history()
-        return jsonify({"source_name": source_name, "history": history, "total_exchanges": len(history)})
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+        before = request.args.get('before', type=int)
+        history, next_cursor = history_store.list(source_name, limit, before)
+        return jsonify({
+            "source_name": source_name,
+            "history": history,
+            "next_cursor": next_cursor,
+            "total_exchanges": history_store.count(source_name)
+        })
     except Exception as e:
         return jsonify({"error": f"Failed to retrieve chat history: {str(e)}"}), 500
 
 @assistant_bp.route("/<source_name>/clear_history", methods=['POST'])
 def clear_chat_history(source_name):
     try:
-        from services.assistant import chat_histories
-        if source_name in chat_histories:
-            del chat_histories[source_name]
+        history_store.clear(source_name)
         return jsonify({"message": f"Chat history cleared for source: {source_name}"})
     except Exception as e:
         return jsonify({"error": f"Failed to clear chat history: {str(e)}"}), 500
@@ -0,0 +1,16 @@
+from flask import Blueprint, jsonify
+from services.warmup import source_warmer
+
+health_bp = Blueprint("health", __name__)
+
+@health_bp.get("/health")
+def health():
+    """Liveness check: the process is up and serving requests."""
+    readiness = source_warmer.readiness()
+    return jsonify({"status": "ok", "ready": readiness["ready"]}), 200
+
+@health_bp.get("/health/ready")
+def ready():
+    """Readiness check for load balancers: 503 until startup warm-up has gone through every source."""
+    readiness = source_warmer.readiness()
+    return jsonify(readiness), 200 if readiness["ready"] else 503
@@ -0,0 +1,61 @@
+from flask import Blueprint, Response, request, g
+import json
+import time
+from services.metrics import metrics, request_labels, request_timings, summarize_timings
+
+metrics_bp = Blueprint("metrics", __name__)
+
+DEBUG_TIMING_HEADER = 'X-Debug-Timing'
+
+@metrics_bp.before_app_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    source = (request.view_args or {}).get("source_name", "")
+    g.request_labels_token = request_labels.set({"route": route, "source": source})
+    if str(request.headers.get(DEBUG_TIMING_HEADER)).lower() in ('1', 'true', 'yes'):
+        g.request_timings_token = request_timings.set([])
+
+@metrics_bp.after_app_request
+def finish_request_metrics(response):
+    """
+    Records the request duration and, when the debug header is set, adds the stage timing breakdown to JSON
+    responses under "timings" and to the Server-Timing header.
+    """
+    elapsed = time.perf_counter() - g.get('request_started', time.perf_counter())
+    labels = request_labels.get()
+    metrics.observe(
+        "assistant_http_request_duration_seconds", elapsed,
+        route=labels["route"], method=request.method, status=response.status_code
+    )
+
+    timings = request_timings.get()
+    if timings is None or response.is_streamed:
+        return response
+
+    summary = summarize_timings(timings, elapsed)
+    response.headers['Server-Timing'] = ", ".join(
+        [f"{stage};dur={stats['seconds'] * 1000:.1f}" for stage, stats in summary["stages"].items()]
+        + [f"total;dur={elapsed * 1000:.1f}"]
+    )
+    if response.is_json:
+        data = response.get_json(silent=True)
+        if isinstance(data, dict):
+            data["timings"] = summary
+            response.set_data(json.dumps(data))
+    return response
+
+@metrics_bp.teardown_app_request
+def reset_request_metrics(exc=None):
+    for name, var in (('request_timings_token', request_timings), ('request_labels_token', request_labels)):
+        token = g.pop(name, None)
+        if token is not None:
+            try:
+                var.reset(token)
+            except ValueError:
+                pass
+
+@metrics_bp.get("/metrics")
+def prometheus_metrics():
+    """Exposes the metrics of this worker process in the Prometheus text format."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
@@ -1,13 +1,54 @@
 from flask import Blueprint, request, jsonify
 import os
+import shutil
+import tempfile
+from werkzeug.formparser import parse_form_data
+from werkzeug.utils import secure_filename
+from services.registry import assistant_registry
+from services.source import ingest_source_file, remove_source_files, store_uploaded_file
+from services.jobs import job_queue
+from services.ingest import run_ingest_job
+from services.manifest import list_source_names, get_manifest, refresh_manifest, manifest_summary, delete_manifest
 
 source_bp = Blueprint('source', __name__)
 
+job_queue.register("ingest", run_ingest_job)
+
+def _page_params(default_limit: int, max_limit: int):
+    limit = max(1, min(request.args.get("limit", default_limit, type=int), max_limit))
+    return limit, request.args.get("after", "")
+
+def _conditional_json(data):
+    """JSON response with an ETag over its body, answered with 304 when the client already has it."""
+    response = jsonify(data)
+    response.add_etag()
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
 @source_bp.get('/')
 def get_sources():
-    source_dirs = os.listdir('uploads/sources')
-    sources = [{"name": dir, "images": list(filter(lambda x: x.endswith(('.png', '.jpg', '.jpeg')), os.listdir(f'uploads/sources/{dir}')))} for dir in source_dirs]
-    return jsonify({"sources": sources}), 200
+    """
+    Lists sources from their manifests, in name order. Pages with `limit` and the `after` cursor (the last name
+    of the previous page); image names are only included with `include_images=1`.
+    """
+    limit, after = _page_params(100, 500)
+    include_images = request.args.get("include_images", "0").lower() in ("1", "true", "yes")
+    names = list_source_names()
+    page = [name for name in names if name > after][:limit + 1]
+
+    sources = []
+    for name in page[:limit]:
+        manifest = get_manifest(name)
+        if manifest is None:
+            continue
+        entry = manifest_summary(manifest)
+        entry["image_count"] = manifest["page_count"]
+        if include_images:
+            entry["images"] = list(manifest["files"])
+        sources.append(entry)
+
+    next_cursor = page[limit - 1] if len(page) > limit else None
+    return _conditional_json({"sources": sources, "next_cursor": next_cursor, "total": len(names)})
 
 
 @source_bp.post('/')
@@ -20,22 +61,36 @@ def create_source():
     if os.path.exists(source_path):
         return jsonify({"message": "Source already exists"}), 400
     os.makedirs(source_path)
+    refresh_manifest(source_name)
     return jsonify({"message": "Source created successfully"}), 201
 
 @source_bp.get('/<source_name>')
 def get_source(source_name):
-    source_path = f"uploads/sources/{source_name}"
-    if not os.path.exists(source_path):
+    """Returns a source's manifest summary and its images, optionally paged with `limit` and `after`."""
+    manifest = get_manifest(source_name)
+    if manifest is None:
         return jsonify({"message": "Source not found"}), 404
-    images = list(filter(lambda x: x.endswith(('.png', '.jpg', '.jpeg')), os.listdir(source_path)))
-    return jsonify({"name": source_name, "images": images}), 200
+    limit, after = _page_params(len(manifest["files"]) or 1, 10000)
+    names = [name for name in manifest["files"] if name > after]
+    images = names[:limit]
+    data = manifest_summary(manifest)
+    data["image_count"] = manifest["page_count"]
+    data["images"] = images
+    data["files"] = {name: manifest["files"][name] for name in images}
+    data["next_cursor"] = images[-1] if len(names) > limit else None
+    return _conditional_json(data)
 
 
 @source_bp.delete('/<source_name>')
 def delete_source(source_name):
     source_path = f'uploads/sources/{source_name}'
     if os.path.exists(source_path):
-        os.rmdir(source_path)
+        # Only empty sources can be deleted; hidden entries (index, manifest, staged uploads) go with the folder.
+        if any(not entry.startswith('.') for entry in os.listdir(source_path)):
+            return jsonify({"message": "Source is not empty; delete its files first"}), 400
+        shutil.rmtree(source_path)
+        delete_manifest(source_name)
+        assistant_registry.invalidate(source_name)
         return jsonify({"message": "Source deleted successfully"}), 200
     return jsonify({"message": "Source not found"}), 404
 
@@ -52,16 +107,75 @@ def upload_image(source_name):
     if not file.filename.endswith(('.png', '.jpg', '.jpeg')):
         return jsonify({"message": "Invalid file type"}), 400
     file.save(os.path.join(source_path, file.filename))
+    error = None
+    try:
+        ingest_source_file(source_name, file.filename)
+    except Exception as e:
+        print(f"Failed to index {file.filename} for {source_name}: {e}")
+        error = str(e)
+    refresh_manifest(source_name)
+    assistant_registry.invalidate(source_name)
+    if error:
+        return jsonify({"message": "File uploaded, but it could not be OCRed and indexed", "error": error}), 201
     return jsonify({"message": "File uploaded successfully"}), 201
 
+@source_bp.post('/<source_name>/upload/bulk')
+def bulk_upload(source_name):
+    """
+    Accepts any number of `file` parts, streaming each one to disk as it arrives, and queues an ingest job
+    that pre-processes, OCRs and indexes them in the background. Poll the returned status_url for per-file status.
+    """
+    source_path = f'uploads/sources/{source_name}'
+    if not os.path.exists(source_path):
+        return jsonify({"message": "Source not found"}), 404
+
+    staging_path = os.path.join(source_path, '.incoming')
+    os.makedirs(staging_path, exist_ok=True)
+
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        return tempfile.NamedTemporaryFile(dir=staging_path, prefix='upload-', delete=False)
+
+    _, _, files = parse_form_data(request.environ, stream_factory=stream_factory)
+
+    saved = []
+    rejected = []
+    for file in files.getlist('file'):
+        temp_path = file.stream.name
+        file.stream.close()
+        filename = secure_filename(file.filename or '')
+        if not filename or not filename.lower().endswith(('.png', '.jpg', '.jpeg')):
+            os.remove(temp_path)
+            rejected.append(file.filename)
+            continue
+        store_uploaded_file(source_name, temp_path, filename)
+        if filename not in saved:
+            saved.append(filename)
+
+    if not saved:
+        return jsonify({"message": "No valid files uploaded", "rejected": rejected}), 400
+
+    # The manifest and the cached assistant are updated by the ingest job once the files are OCRed and indexed;
+    # doing it here would make a request in between OCR and index the whole source alongside the job.
+    job_id = job_queue.submit("ingest", source_name, {"files": saved})
+    return jsonify({
+        "message": f"{len(saved)} files uploaded",
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/assistant/jobs/{job_id}",
+        "files": saved,
+        "rejected": rejected
+    }), 202
+
 @source_bp.delete('/<source_name>/files')
 def delete_uploaded_files(source_name):
     filenames = request.json.get("fileNames", [])
     source_path = f'uploads/sources/{source_name}'
     if not os.path.exists(source_path):
         return jsonify({"message": "Source not found"}), 404
-    for filename in filenames:
-        file_path = os.path.join(source_path, filename)
-        if os.path.exists(file_path):
-            os.remove(file_path)
+    try:
+        remove_source_files(source_name, filenames)
+    except Exception as e:
+        print(f"Failed to update index for {source_name}: {e}")
+    refresh_manifest(source_name)
+    assistant_registry.invalidate(source_name)
     return jsonify({"message": "Files deleted successfully"}), 200
\ No newline at end of file
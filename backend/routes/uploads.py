@@ -0,0 +1,61 @@
+import os
+from typing import Optional
+from flask import Blueprint, current_app, request, send_file, abort
+from werkzeug.security import safe_join
+from services.manifest import SOURCES_DIR
+from services.thumbnails import get_thumbnail, source_file_hash, thumbnail_size
+from config import UPLOADS_MAX_AGE_SECONDS
+
+uploads_bp = Blueprint("uploads", __name__)
+
+def _is_hidden(path: str) -> bool:
+    return any(part.startswith('.') for part in path.replace('\\', '/').split('/'))
+
+def _send(path: str, etag: str, mimetype: Optional[str] = None):
+    """
+    Sends a file with a strong ETag and Range support. Responses requested with `?v=<hash prefix>` matching
+    the content are cacheable for UPLOADS_MAX_AGE_SECONDS; anything else must be revalidated (and usually
+    comes back as 304).
+    """
+    response = send_file(path, mimetype=mimetype, etag=etag, conditional=True)
+    version = request.args.get("v", "")
+    if version and etag.startswith(version):
+        response.headers["Cache-Control"] = f"public, max-age={UPLOADS_MAX_AGE_SECONDS}, immutable"
+    else:
+        response.headers["Cache-Control"] = "no-cache"
+    return response
+
+@uploads_bp.get('/uploads/<path:filename>')
+def uploaded_file(filename):
+    """Serves a file from the upload directory. Hidden files (manifests, indexes, staged uploads) are not served."""
+    uploads_dir = os.path.join(current_app.root_path, 'uploads')
+    file_path = safe_join(uploads_dir, filename)
+    if file_path is None or _is_hidden(filename) or not os.path.isfile(file_path):
+        abort(404)
+
+    parts = filename.split('/')
+    sha256 = source_file_hash(parts[1], parts[2]) if len(parts) == 3 and parts[0] == 'sources' else None
+    if sha256 is None:
+        stat = os.stat(file_path)
+        sha256 = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+    return _send(file_path, sha256)
+
+@uploads_bp.get('/thumbnails/<source_name>/<int:size>/<filename>')
+def thumbnail(source_name, size, filename):
+    """
+    Serves a JPEG preview of a source image, at most `size` pixels on its longest side (snapped to one of
+    THUMBNAIL_SIZES). Falls back to the original image when no thumbnail can be rendered.
+    """
+    if _is_hidden(source_name) or _is_hidden(filename) or size <= 0:
+        abort(404)
+    size = thumbnail_size(size)
+    rendered = get_thumbnail(source_name, filename, size)
+    if rendered is not None:
+        thumbnail_path, sha256 = rendered
+        return _send(os.path.abspath(thumbnail_path), f"{sha256}-{size}", mimetype="image/jpeg")
+
+    file_path = safe_join(os.path.abspath(SOURCES_DIR), source_name, filename)
+    sha256 = source_file_hash(source_name, filename)
+    if file_path is None or sha256 is None:
+        abort(404)
+    return _send(file_path, sha256)
@@ -1,17 +1,35 @@
-
-from langchain_core.documents import Document
-from langchain_nvidia_ai_endpoints import ChatNVIDIA, NVIDIAEmbeddings
-from services.source import read_sources
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
+from services.source import read_source_pages
+from services.index import source_fingerprint, source_lock, load_index, save_index, build_index, search_many, page_label
 from langchain_core.messages import HumanMessage
-from langchain.output_parsers import PydanticOutputParser, OutputFixingParser
+from langchain.output_parsers import PydanticOutputParser
+from langchain_core.exceptions import OutputParserException
 from langchain_core.prompts import ChatPromptTemplate
+import contextvars
+import copy
 import json
-from typing import List, Dict, Any
+import re
+from typing import List, Dict, Any, Iterator, Tuple
 from pydantic import BaseModel, Field
 from typing import Optional
-from config import NVIDIA_API_KEY
+from config import ANSWER_CONCURRENCY, DETECTION_MODE, DETECTION_SEGMENT_CHARS, DETECTION_CONCURRENCY, \
+    LOCAL_DETECTION_MIN_CONFIDENCE, CONTEXT_MAX_TOKENS, CONTEXT_MMR_LAMBDA, \
+    SINGLE_RESPONSE_MAX_TOKENS, SINGLE_RESPONSE_STUFF_MAX_TOKENS, OUTPUT_REPAIR_RETRIES
+from services.segments import split_content_segments
+from services.question_parser import parse_questions
+from services.llm_cache import cached_llm, bypass_llm_cache
+from services.providers import create_llm, create_embeddings
+from services.context_builder import assemble_context, estimate_tokens, source_label
+from services.metrics import span, timed
+from services.history import history_store
+from services.manifest import refresh_manifest
+from services.output_repair import salvage_parser
+from services.batch_planner import plan_answer_batches, detection_batch_size, record_detected_questions, record_answers
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+def _question_number_key(number: Any) -> str:
+    """Normalises a question number for matching answers to questions, so "3", "3." and "(3)" agree."""
+    return re.sub(r'^[\s(]+|[\s.):]+$', '', str(number)).lower()
 
 class Question(BaseModel):
     """Represents a single detected question."""
@@ -39,57 +57,51 @@ class AnswerBatchOutput(BaseModel):
     """The final structured output for a batch of answers."""
     answers: List[Answer] = Field(description="A list of all answers generated for the batch of questions.")
 
-chat_histories = {}
-
 class HomeworkAnswerAssistant:
     def __init__(self, source_name: str):
-        self.llm = ChatNVIDIA(
-            model="meta/llama-4-maverick-17b-128e-instruct",
-            api_key=NVIDIA_API_KEY,
-            max_tokens=4096,
-        )
-        self.embeddings = NVIDIAEmbeddings()
+        self.llm = create_llm()
+        self.embeddings = create_embeddings()
         self.source_name = source_name
         self.vectorstore = None
         self.source_texts = []
+        self.source_pages = {}
         self._setup_knowledge_base()
 
     def _setup_knowledge_base(self):
         """Setup the knowledge base from source materials."""
-        self.source_texts = read_sources(self.source_name)
-        if not self.source_texts:
-            print("No source texts found!")
-            return
-        
-        docs = [Document(page_content=text, metadata={"source_id": f"Source_{i+1}", "page": i+1}) 
-                for i, text in enumerate(self.source_texts)]
-        
-        chunked_docs = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50).split_documents(docs)
-        self.vectorstore = FAISS.from_documents(chunked_docs, self.embeddings)
-
-    def get_chat_history(self) -> List[Dict[str, str]]:
-        """Get chat history for this source."""
-        return chat_histories.get(self.source_name, [])
+        with source_lock(self.source_name):
+            pages = read_source_pages(self.source_name)
+            self.source_pages = pages
+            self.source_texts = list(pages.values())
+            if not self.source_texts:
+                print("No source texts found!")
+                return
+
+            embedding_model = getattr(self.embeddings, "model", "") or ""
+            fingerprint = source_fingerprint(self.source_name, embedding_model)
+            self.vectorstore = load_index(self.source_name, fingerprint, self.embeddings)
+            if self.vectorstore:
+                print(f"Loaded persisted index for {self.source_name}")
+                return
+
+            self.vectorstore = build_index(pages, self.embeddings)
+            if self.vectorstore:
+                save_index(self.source_name, fingerprint, self.vectorstore, list(pages), embedding_model)
+                refresh_manifest(self.source_name)
+
+    def get_chat_history(self, limit: int = 50, before: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get the most recent chat history for this source."""
+        return history_store.list(self.source_name, limit, before)[0]
 
     def add_to_chat_history(self, user_message: str, assistant_response: str):
         """Add conversation to chat history."""
-        if self.source_name not in chat_histories:
-            chat_histories[self.source_name] = []
-        
-        chat_histories[self.source_name].append({
-            "user": user_message,
-            "assistant": assistant_response
-        })
-
-    def detect_questions(self, ocr_content: str, additional_text: str = "", user_corrections: str = "") -> Dict[str, Any]:
-        """
-        Detect and organize questions from OCR content and text input using a robust, iterative batching process.
-        """
-        if not self.vectorstore:
-            return {"error": "No knowledge base available"}
+        history_store.add(self.source_name, user_message, assistant_response)
 
+    def _build_detection_chain(self):
+        """Builds the prompt | llm | parser chain used to detect a batch of questions."""
         parser = PydanticOutputParser(pydantic_object=QuestionDetectionOutput)
-        output_fixer = OutputFixingParser.from_llm(parser=parser, llm=self.llm)
+        # Truncated output without the flag keeps the loop going; it stops once a batch brings nothing new.
+        output_parser = salvage_parser(QuestionDetectionOutput, "questions", Question, {"is_more_questions": True})
 
         prompt_template = ChatPromptTemplate.from_template(
             """
@@ -133,35 +145,41 @@ class HomeworkAnswerAssistant:
             **Final Output:** Your response MUST be a single, valid JSON object matching the provided format instructions. Do not include any other text or explanations.
 
             {format_instructions}
-            """
+            """,
+            partial_variables={"format_instructions": parser.get_format_instructions()}
         )
 
-        chain = prompt_template | self.llm | output_fixer
+        return prompt_template | cached_llm(self.llm, timed("output_parsing", output_parser))
 
+    def _detect_in_content(self, chain, combined_content: str, user_corrections: str = "",
+                           max_questions: int = 200) -> List[Question]:
+        """
+        Detect questions in one piece of content by asking for batches until the model reports no more questions.
+        """
         all_detected_questions = []
         seen_question_identifiers = set()
 
         is_more_questions = True
-        batch_size = 15
-        max_questions = 200
-        combined_content = f"{ocr_content}\n{additional_text}".strip()
+        parse_failures = 0
 
         while is_more_questions and len(all_detected_questions) < max_questions:
+            batch_size = min(detection_batch_size(), max_questions - len(all_detected_questions))
             already_detected_json = json.dumps(
                 [q.model_dump(include={'question_number', 'section', 'question'}) for q in all_detected_questions],
                 indent=2
             )
 
             try:
+                # Unparseable responses are never cached, so a retry of the same prompt is a live call anyway.
                 response = chain.invoke({
                     "combined_content": combined_content,
                     "user_corrections": user_corrections or "None",
                     "already_detected_questions_json": already_detected_json,
                     "batch_size": batch_size,
-                    "format_instructions": parser.get_format_instructions(),
                 })
 
                 newly_detected = response.questions if response and response.questions else []
+                record_detected_questions([q.model_dump() for q in newly_detected])
 
                 if not newly_detected:
                     print("No new questions detected in this batch. Stopping.")
@@ -183,10 +201,68 @@ class HomeworkAnswerAssistant:
 
                 print(f"Detected {len(unique_new_questions)} new questions. Total: {len(all_detected_questions)}. More questions? {is_more_questions}")
 
+            except OutputParserException as e:
+                parse_failures += 1
+                print(f"Unparseable detection output (attempt {parse_failures}): {e}")
+                is_more_questions = parse_failures <= OUTPUT_REPAIR_RETRIES
+
             except Exception as e:
                 print(f"An error occurred during question detection: {e}")
                 is_more_questions = False
-        
+
+        return all_detected_questions
+
+    def _detect_segment(self, chain, segment: str, user_corrections: str = "", max_questions: int = 200) -> List[Question]:
+        """
+        Detect questions in one segment with the local parser, calling the LLM only when the parser's
+        confidence is low or user corrections have to be applied.
+        """
+        if not user_corrections:
+            parsed_questions, confidence = parse_questions(segment)
+            if parsed_questions and confidence >= LOCAL_DETECTION_MIN_CONFIDENCE:
+                print(f"Locally detected {len(parsed_questions)} questions (confidence {confidence})")
+                return [Question(**q) for q in parsed_questions[:max_questions]]
+
+        return self._detect_in_content(chain, segment, user_corrections, max_questions)
+
+    def detect_questions(self, ocr_content: str, additional_text: str = "", user_corrections: str = "",
+                         mode: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Detect and organize questions from OCR content and text input using a robust, iterative batching process.
+        In "segmented" mode the content is split into bounded segments that are detected in parallel.
+        Cleanly numbered segments are parsed locally without an LLM call.
+        """
+        if not self.vectorstore:
+            return {"error": "No knowledge base available"}
+
+        chain = self._build_detection_chain()
+        max_questions = 200
+        combined_content = f"{ocr_content}\n{additional_text}".strip()
+
+        segments = [combined_content]
+        if (mode or DETECTION_MODE) == "segmented":
+            segments = split_content_segments(combined_content, DETECTION_SEGMENT_CHARS) or [combined_content]
+
+        if len(segments) == 1:
+            segment_results = [self._detect_segment(chain, segments[0], user_corrections, max_questions)]
+        else:
+            print(f"Detecting questions in {len(segments)} segments")
+            with ThreadPoolExecutor(max_workers=min(DETECTION_CONCURRENCY, len(segments))) as executor:
+                futures = [
+                    executor.submit(contextvars.copy_context().run, self._detect_segment, chain, segment, user_corrections, max_questions)
+                    for segment in segments
+                ]
+                segment_results = [future.result() for future in futures]
+
+        all_detected_questions = []
+        seen_question_identifiers = set()
+        for questions in segment_results:
+            for q in questions:
+                identifier = (q.section, q.question_number, q.question.strip())
+                if identifier not in seen_question_identifiers and len(all_detected_questions) < max_questions:
+                    seen_question_identifiers.add(identifier)
+                    all_detected_questions.append(q)
+
         final_output = QuestionDetectionOutput(
             questions=all_detected_questions,
             is_more_questions=False
@@ -194,15 +270,20 @@ class HomeworkAnswerAssistant:
 
         return final_output
 
-    def answer_question_batch(self, section_type: str, questions: List[Any], batch_size: int = 5) -> List[Dict[str, Any]]:
+    def retrieve_for_questions(self, questions: List[str], k: int = 20) -> List[List[Any]]:
         """
-        Answer a batch of questions from a specific section using structured output parsing.
+        Retrieves the top-k source chunks for every question with one batched embedding call and one FAISS search.
         """
-        if not self.vectorstore:
-            return [{"error": f"No knowledge base available to answer questions for section '{section_type}'."}]
-        all_answers = []
+        non_empty = [i for i, question in enumerate(questions) if question.strip()]
+        results = [[] for _ in questions]
+        for i, docs in zip(non_empty, search_many(self.vectorstore, self.embeddings, [questions[i] for i in non_empty], k)):
+            results[i] = docs
+        return results
+
+    def _build_answer_chain(self):
+        """Builds the prompt | llm | parser chain used to answer a batch of questions."""
         parser = PydanticOutputParser(pydantic_object=AnswerBatchOutput)
-        output_fixer = OutputFixingParser.from_llm(parser=parser, llm=self.llm)
+        output_parser = salvage_parser(AnswerBatchOutput, "answers", Answer, {})
 
         prompt_template = ChatPromptTemplate.from_template(
             """
@@ -230,86 +311,213 @@ class HomeworkAnswerAssistant:
             """,
             partial_variables={"format_instructions": parser.get_format_instructions()}
         )
-        chain = prompt_template | self.llm | output_fixer
-
-        for i in range(0, len(questions), batch_size):
-            batch_questions = questions[i:i + batch_size]
-            try:
-                unique_docs = {} 
-            
-                for question in batch_questions:
-                    retrieved_docs = self.vectorstore.similarity_search(question.get("question"), k=20)
-                    for doc in retrieved_docs:
-                        unique_docs[doc.page_content] = doc
+        return prompt_template | cached_llm(self.llm, timed("output_parsing", output_parser))
 
-                if not unique_docs:
-                    retrieved_context = "No relevant source material could be found for the questions in this batch."
-                else:
-                    retrieved_context = "\n\n".join(
-                        [f"Source Chunk {{R{doc.metadata.get('page')}}}: {doc.page_content}" for doc in unique_docs.values()]
-                    )
+    def _plan_section_batches(self, section_type: str, questions: List[Any], question_indices: List[int],
+                              batch_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Splits the questions of a section into batches, retrieving context for the whole section at once.
+        Without a fixed `batch_size`, batches are packed by estimated prompt and answer tokens.
+        """
+        section_questions = [questions[i] for i in question_indices]
+        retrieved_docs_per_question = self.retrieve_for_questions([q.get("question") or "" for q in section_questions])
+        if batch_size:
+            groups = [list(range(i, min(i + batch_size, len(section_questions))))
+                      for i in range(0, len(section_questions), batch_size)]
+        else:
+            groups = plan_answer_batches(section_questions)
+        return [
+            {
+                "section": section_type,
+                "indices": [question_indices[i] for i in group],
+                "questions": [section_questions[i] for i in group],
+                "retrieved": [retrieved_docs_per_question[i] for i in group],
+            }
+            for group in groups
+        ]
+
+    @staticmethod
+    def _unanswered(questions: List[Any], answers: List[Dict[str, Any]]) -> List[Any]:
+        """Returns the questions that no answer matches by question number."""
+        remaining = Counter(_question_number_key(answer.get("question_number")) for answer in answers)
+        pending = []
+        for q in questions:
+            key = _question_number_key(q.get("question_number"))
+            if remaining[key] > 0:
+                remaining[key] -= 1
+            else:
+                pending.append(q)
+        return pending
+
+    def _answer_batch(self, chain, batch: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Answer one planned batch. Answers that parse are kept; questions left unanswered by malformed or
+        truncated output are re-requested on their own, up to OUTPUT_REPAIR_RETRIES times. Questions that still
+        fail are reported as error answers and recorded under the batch's "error" key.
+        """
+        section_type = batch["section"]
+        batch_questions = batch["questions"]
+        answers = []
+        error = None
+        try:
+            assembled = assemble_context(batch["retrieved"], CONTEXT_MAX_TOKENS, CONTEXT_MMR_LAMBDA)
+            batch["context"] = assembled["report"]
+            if assembled["report"]["dropped_chunks"]:
+                print(f"Context for {section_type} batch: {assembled['report']}")
+
+            retrieved_context = assembled["context"]
+            if not retrieved_context:
+                retrieved_context = "No relevant source material could be found for the questions in this batch."
+
+            pending = batch_questions
+            previous_pending = None
+            for attempt in range(OUTPUT_REPAIR_RETRIES + 1):
+                if attempt:
+                    print(f"Re-requesting {len(pending)} unanswered questions: {[q.get('question_number') for q in pending]}")
+                try:
+                    # A retry for fewer questions is a new prompt with its own cache entry; only a repeat of the
+                    # exact prompt whose (parseable) response answered nothing has to skip the cache.
+                    with bypass_llm_cache(pending == previous_pending):
+                        response = chain.invoke({
+                            "section_type": section_type,
+                            "retrieved_context": retrieved_context,
+                            "questions_json": pending,
+                        })
+                    batch_answers = [ans.model_dump() for ans in response.answers]
+                    record_answers(pending, batch_answers)
+                    answers.extend(batch_answers)
+                except OutputParserException as e:
+                    error = f"Unparseable model output: {e}"
+                previous_pending = pending
+                pending = self._unanswered(batch_questions, answers)
+                if not pending:
+                    print(f"Successfully processed batch for questions: {[q.get('question_number') for q in batch_questions]}")
+                    break
 
-                response = chain.invoke({
-                    "section_type": section_type,
-                    "retrieved_context": retrieved_context,
-                    "questions_json": batch_questions,
-                })
+        except Exception as e:
+            print(f"Error processing batch starting with question {batch_questions[0].get('question_number')}: {e}")
+            error = str(e)
+
+        pending = self._unanswered(batch_questions, answers)
+        if pending:
+            error = error or "The model returned no answer for these questions"
+            batch["error"] = error if len(pending) == len(batch_questions) else \
+                f"{len(pending)} of {len(batch_questions)} questions failed: {error}"
+            answers.extend({
+                "question_number": q.get("question_number"),
+                "question": q.get("question"),
+                "answer": f"Error processing question: {error}",
+                "source": "Error in processing",
+                "section": q.get("section"),
+                "question_type": section_type,
+                "options_with_answer": None
+            } for q in pending)
+        return answers
+
+    def _iter_batch_results(self, chain, batches: List[Dict[str, Any]], max_workers: int) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+        """
+        Answer independent batches on a bounded thread pool, yielding (batch index, answers) as each batch completes.
+        """
+        if max_workers <= 1 or len(batches) <= 1:
+            for i, batch in enumerate(batches):
+                yield i, self._answer_batch(chain, batch)
+            return
 
-                all_answers.extend(response.answers)
-                print(f"Successfully processed batch for questions: {[q.get('question_number') for q in batch_questions]}")
+        executor = ThreadPoolExecutor(max_workers=min(max_workers, len(batches)))
+        try:
+            futures = {
+                executor.submit(contextvars.copy_context().run, self._answer_batch, chain, batch): i
+                for i, batch in enumerate(batches)
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
 
-            except Exception as e:
-                print(f"Error processing batch starting with question {batch_questions.get('question_number')}: {e}")
-                print(e)
-                for q in batch_questions:
-                    all_answers.append({
-                        "question_number": q.get("question_number"),
-                        "question": q.get("question"),
-                        "answer": f"Error processing question: {str(e)}",
-                        "source": "Error in processing",
-                        "section": q.get("section"),
-                        "question_type": section_type,
-                        "options_with_answer": None
-                    })
-        return [ans.model_dump() for ans in all_answers]
+    def _run_batches(self, chain, batches: List[Dict[str, Any]], max_workers: int) -> List[List[Dict[str, Any]]]:
+        """
+        Answer independent batches on a bounded thread pool. Results are returned in batch order.
+        """
+        batch_answers = [[] for _ in batches]
+        for i, answers in self._iter_batch_results(chain, batches, max_workers):
+            batch_answers[i] = answers
+        return batch_answers
 
-    def answer_all_questions(self, detection_result: Dict[str, Any], ocr_content: str, 
-                           additional_text: str = "") -> Dict[str, Any]:
+    @staticmethod
+    def _order_answers(batches: List[Dict[str, Any]], batch_answers: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Flattens batch answers back into the original question order, matching answers to questions by number.
+        Answers that match no question of their batch (e.g. questions the model invented) are logged and
+        appended after the ordered answers.
         """
-        Answer all questions by processing each section in batches.
+        keyed_answers = []
+        extra_answers = []
+        for batch, answers in zip(batches, batch_answers):
+            unmatched = list(zip(batch["indices"], batch["questions"]))
+            for answer in answers:
+                key = _question_number_key(answer.get("question_number"))
+                position = next(
+                    (i for i, (_, q) in enumerate(unmatched) if _question_number_key(q.get("question_number")) == key),
+                    None
+                )
+                if position is None:
+                    extra_answers.append(answer)
+                    continue
+                keyed_answers.append((unmatched.pop(position)[0], len(keyed_answers), answer))
+        if extra_answers:
+            print(f"Answers matching no question: {[answer.get('question_number') for answer in extra_answers]}")
+        return [answer for _, _, answer in sorted(keyed_answers, key=lambda item: item[:2])] + extra_answers
+
+    def answer_question_batch(self, section_type: str, questions: List[Any], batch_size: Optional[int] = None,
+                              max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Answer a batch of questions from a specific section using structured output parsing.
         """
         if not self.vectorstore:
-            return {"error": "No knowledge base available for this source."}
+            return [{"error": f"No knowledge base available to answer questions for section '{section_type}'."}]
 
-        if detection_result.get("error"):
-            return detection_result
+        chain = self._build_answer_chain()
+        batches = self._plan_section_batches(section_type, questions, list(range(len(questions))), batch_size)
+        batch_answers = self._run_batches(chain, batches, max_workers or ANSWER_CONCURRENCY)
+        return self._order_answers(batches, batch_answers)
 
+    def _plan_all_batches(self, questions: List[Any], batch_size: Optional[int] = None,
+                          skip_indices: Optional[set] = None) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """
+        Groups questions by section (in order of first appearance) and plans the answer batches of every section,
+        leaving out questions in `skip_indices`.
+        """
+        skip_indices = skip_indices or set()
+        sections = list(dict.fromkeys(question.get("section", "Unknown") for question in questions))
+        print(f"Processing {len(questions) - len(skip_indices)} questions")
 
-        all_answers = []
-        batch_size = 10
-        questions = detection_result.get("questions", [])
-        sections = set(question.get("section", "Unknown") for question in questions)
-        print(f"Processing {len(questions)} questions")
+        batches = []
         for section in sections:
-            section_questions = list(filter(lambda q: q.get("section") == section, questions))
+            question_indices = [
+                i for i, q in enumerate(questions)
+                if q.get("section", "Unknown") == section and i not in skip_indices
+            ]
 
-            if not section_questions:
+            if not question_indices:
                 continue
 
-            print(f"Processing section: {section} with questions: {len(section_questions)}")
-            
-            section_answers = self.answer_question_batch(
-                section, section_questions, batch_size
-            )
-            
-            if section_answers:
-                all_answers.extend(section_answers)
+            print(f"Processing section: {section} with questions: {len(question_indices)}")
+            batches.extend(self._plan_section_batches(section, questions, question_indices, batch_size))
+        return sections, batches
+
+    def _build_answer_result(self, sections: List[str], batches: List[Dict[str, Any]],
+                             batch_answers: List[List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Assembles the ordered answers, markdown and per-section summary returned for a set of answered batches.
+        """
+        all_answers = self._order_answers(batches, batch_answers)
         
         if not all_answers:
             return {"error": "No answers generated"}
         
         
-        markdown_content = self.convert_to_markdown(all_answers, sections)
+        with span("markdown"):
+            markdown_content = self.convert_to_markdown(all_answers, sections)
         
         return {
             "type": "structured_answers",
@@ -323,6 +531,95 @@ class HomeworkAnswerAssistant:
             }
         }
 
+    def answer_all_questions(self, detection_result: Dict[str, Any], ocr_content: str, 
+                           additional_text: str = "", max_workers: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Answer all questions by processing each section in batches, running independent batches concurrently.
+        """
+        if not self.vectorstore:
+            return {"error": "No knowledge base available for this source."}
+
+        if detection_result.get("error"):
+            return detection_result
+
+        sections, batches = self._plan_all_batches(detection_result.get("questions", []))
+
+        chain = self._build_answer_chain()
+        batch_answers = self._run_batches(chain, batches, max_workers or ANSWER_CONCURRENCY)
+        return self._build_answer_result(sections, batches, batch_answers)
+
+    def stream_answers(self, detection_result: Dict[str, Any], max_workers: Optional[int] = None,
+                       completed_batches: Optional[List[Dict[str, Any]]] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Answer all questions like answer_all_questions, yielding ("batch", ...) and ("progress", ...) events as
+        batches complete and a final ("done", result) event with the ordered result.
+        Batches from an earlier run passed in `completed_batches` (as yielded in "batch" events) are reused
+        instead of being answered again.
+        """
+        if not self.vectorstore:
+            yield "error", {"error": "No knowledge base available for this source."}
+            return
+
+        if detection_result.get("error"):
+            yield "error", detection_result
+            return
+
+        questions = detection_result.get("questions", [])
+        completed_batches = completed_batches or []
+        completed_indices = {i for batch in completed_batches for i in batch["question_indices"]}
+        sections, batches = self._plan_all_batches(questions, skip_indices=completed_indices)
+        reused_batches = [
+            {
+                "section": batch["section"],
+                "indices": batch["question_indices"],
+                "questions": [questions[i] for i in batch["question_indices"]],
+            }
+            for batch in completed_batches
+        ]
+
+        section_progress = {
+            section: {"answered": 0, "total": len([q for q in questions if q.get("section", "Unknown") == section])}
+            for section in sections
+        }
+        for batch in reused_batches:
+            section_progress.setdefault(batch["section"], {"answered": 0, "total": 0})["answered"] += len(batch["indices"])
+
+        progress = {
+            "completed_batches": len(reused_batches),
+            "total_batches": len(reused_batches) + len(batches),
+            "answered_questions": len(completed_indices),
+            "total_questions": len(questions),
+            "sections": section_progress,
+        }
+        yield "progress", copy.deepcopy(progress)
+
+        chain = self._build_answer_chain()
+        batch_answers = [[] for _ in batches]
+        for i, answers in self._iter_batch_results(chain, batches, max_workers or ANSWER_CONCURRENCY):
+            batch_answers[i] = answers
+            progress["completed_batches"] += 1
+            progress["answered_questions"] += len(batches[i]["indices"])
+            section_progress[batches[i]["section"]]["answered"] += len(batches[i]["indices"])
+            yield "batch", {
+                "batch_index": i,
+                "section": batches[i]["section"],
+                "question_indices": batches[i]["indices"],
+                "answers": self._order_answers([batches[i]], [answers]),
+                "succeeded": "error" not in batches[i],
+                "context": batches[i].get("context"),
+            }
+            yield "progress", copy.deepcopy(progress)
+
+        result = self._build_answer_result(
+            sections,
+            reused_batches + batches,
+            [batch["answers"] for batch in completed_batches] + batch_answers
+        )
+        if result.get("error"):
+            yield "error", result
+        else:
+            yield "done", result
+
     def convert_to_markdown(self, answers: List[Dict[str, Any]], sections: List[str]) -> str:
         """
         Convert answers to markdown format with proper section organization.
@@ -378,6 +675,68 @@ class HomeworkAnswerAssistant:
         
         return markdown
 
+    def _single_response_context(self, ocr_content: str, additional_text: str = "", k: int = 20) -> str:
+        """
+        Builds the source context for a free-form response from the chunks retrieved for the content, within
+        SINGLE_RESPONSE_MAX_TOKENS. The whole source is only stuffed in when it fits SINGLE_RESPONSE_STUFF_MAX_TOKENS.
+        """
+        source_tokens = sum(estimate_tokens(text) for text in self.source_texts)
+        if self.source_texts and source_tokens <= SINGLE_RESPONSE_STUFF_MAX_TOKENS:
+            # Same page labels as retrieved chunks, so citations look alike whichever path built the context.
+            return "\n\n".join(source_label(page_label(file)) + text for file, text in self.source_pages.items())
+
+        if not self.vectorstore:
+            return "No source material is available."
+
+        # Long OCR content is split into several queries so each stays within the embedding model's input size.
+        queries = [additional_text.strip()] if additional_text.strip() else []
+        query_chars = 1000
+        queries.extend(
+            piece.strip() for piece in
+            [ocr_content[i:i + query_chars] for i in range(0, len(ocr_content), query_chars)]
+            if piece.strip()
+        )
+        assembled = assemble_context(self.retrieve_for_questions(queries[:8], k), SINGLE_RESPONSE_MAX_TOKENS, CONTEXT_MMR_LAMBDA)
+        print(f"Single response context: {assembled['report']}")
+        return assembled["context"] or "No relevant source material could be found for this content."
+
+    def answer_single_response(self, ocr_content: str, additional_text: str = "") -> Dict[str, Any]:
+        """
+        Respond to content in which no questions were detected with a single free-form answer.
+        """
+        combined_query = f"{ocr_content} {additional_text}".strip()
+        if not combined_query:
+            return {"error": "No content provided"}
+                    
+        context = self._single_response_context(ocr_content, additional_text)
+                    
+        prompt = f"""
+        Based on the source materials, respond to this content:
+        
+        SOURCE CONTEXT:
+        {context}
+        
+        CONTENT TO RESPOND TO:
+        {combined_query}
+        
+        Provide a helpful response based on the source materials. Use Source Chunk {{RX}} format for citations.
+        If the content is not related to the source, mention that and provide your best response anyway but must be relevant.
+        If the content is ambiguous or unclear, ask clarifying questions to better understand the user's intent in a clear and concise response.
+        """
+        
+        try:
+            response = cached_llm(self.llm).invoke([HumanMessage(content=prompt)])
+            markdown_content = f"# Response - {self.source_name}\n\n{response.content}\n\n**Source:** Based on available materials"
+            
+            return {
+                "type": "single_response",
+                "response": response.content,
+                "markdown": markdown_content,
+                "source_name": self.source_name
+            }
+        except Exception as e:
+            return {"error": f"Failed to generate response: {str(e)}"}
+
     def process_content(self, ocr_content: str, additional_text: str = "", user_corrections: str = "") -> Dict[str, Any]:
         """
         Main function to process content in two steps: detect questions, then answer them.
@@ -396,42 +755,7 @@ class HomeworkAnswerAssistant:
 
         if len(detection_result.get('questions', [])) == 0:
             print("No questions detected, treating as simple query...")
-            combined_query = f"{ocr_content} {additional_text}".strip()
-            if not combined_query:
-                return {"error": "No content provided"}
-                        
-            context_parts = []
-            for i, doc in enumerate(self.source_texts):
-                context_parts.append(f"Source Chunk {{R{i+1}}} [Page {i+1}]: {doc}")
-
-            context = "\n\n".join(context_parts)
-                        
-            prompt = f"""
-            Based on the source materials, respond to this content:
-            
-            SOURCE CONTEXT:
-            {context}
-            
-            CONTENT TO RESPOND TO:
-            {combined_query}
-            
-            Provide a helpful response based on the source materials. Use Source Chunk {{RX}} format for citations.
-            If the content is not related to the source, mention that and provide your best response anyway but must be relevant.
-            If the content is ambiguous or unclear, ask clarifying questions to better understand the user's intent in a clear and concise response.
-            """
-            
-            try:
-                response = self.llm.invoke([HumanMessage(content=prompt)])
-                markdown_content = f"# Response - {self.source_name}\n\n{response.content}\n\n**Source:** Based on available materials"
-                
-                return {
-                    "type": "single_response",
-                    "response": response.content,
-                    "markdown": markdown_content,
-                    "source_name": self.source_name
-                }
-            except Exception as e:
-                return {"error": f"Failed to generate response: {str(e)}"}
+            return self.answer_single_response(ocr_content, additional_text)
         
         print("Step 2: Answering questions...")
         result = self.answer_all_questions(detection_result, ocr_content, additional_text)
@@ -0,0 +1,142 @@
+import json
+import math
+import re
+import threading
+import time
+from typing import Any, Dict, List
+from services.db import SQLiteDatabase
+from services.context_builder import estimate_tokens
+from config import LLM_MAX_TOKENS, BATCH_OUTPUT_BUDGET_RATIO, BATCH_INPUT_TOKEN_BUDGET, BATCH_MAX_QUESTIONS
+
+OUTPUT_SIZES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS output_sizes (
+    kind TEXT PRIMARY KEY,
+    samples INTEGER NOT NULL,
+    mean REAL NOT NULL,
+    variance REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+# Output tokens per item assumed until a kind has MIN_SAMPLES observations. For answers this is the size
+# beyond the echoed question, which is estimated from the question itself.
+PRIOR_OUTPUT_TOKENS = {
+    "detected_question": 80,
+    "multiple_choice": 120,
+    "short_answer": 200,
+    "long_answer": 450,
+}
+MIN_SAMPLES = 5
+# Weight of each new observation in the running mean and variance.
+EWMA_ALPHA = 0.1
+# Tokens of the JSON around the items of a batch ({"answers": [...]}, is_more_questions).
+BATCH_OVERHEAD_TOKENS = 40
+LONG_ANSWER_PATTERN = re.compile(r'\b(explain|describe|discuss|compare|justify|why|derive|prove|evaluate)\b', re.IGNORECASE)
+
+def question_kind(question: Dict[str, Any]) -> str:
+    """Buckets a detected question by the size of answer it usually needs."""
+    if question.get("options"):
+        return "multiple_choice"
+    text = question.get("question") or ""
+    if estimate_tokens(text) > 60 or LONG_ANSWER_PATTERN.search(text):
+        return "long_answer"
+    return "short_answer"
+
+def _tokens(value: Any) -> int:
+    return estimate_tokens(json.dumps(value, ensure_ascii=False))
+
+class OutputSizeStats:
+    """
+    Learned output tokens per item kind, as an exponentially weighted mean and variance, kept in SQLite so they
+    survive restarts and are shared by worker processes.
+    """
+    def __init__(self, path: str):
+        self._db = SQLiteDatabase(path, OUTPUT_SIZES_SCHEMA)
+        self._lock = threading.Lock()
+
+    def observe(self, kind: str, tokens: int) -> None:
+        with self._lock:
+            conn = self._db.connect()
+            row = conn.execute("SELECT samples, mean, variance FROM output_sizes WHERE kind = ?", (kind,)).fetchone()
+            samples, mean, variance = row or (0, float(tokens), 0.0)
+            if samples:
+                delta = tokens - mean
+                mean += EWMA_ALPHA * delta
+                variance = (1 - EWMA_ALPHA) * (variance + EWMA_ALPHA * delta * delta)
+            conn.execute(
+                "INSERT OR REPLACE INTO output_sizes (kind, samples, mean, variance, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (kind, samples + 1, mean, variance, time.time())
+            )
+            conn.commit()
+
+    def estimates(self) -> Dict[str, int]:
+        """
+        Output tokens to plan for per kind: mean plus two standard deviations once a kind has enough samples,
+        so long answers rarely overflow a batch, and the prior otherwise.
+        """
+        estimates = dict(PRIOR_OUTPUT_TOKENS)
+        rows = self._db.connect().execute("SELECT kind, samples, mean, variance FROM output_sizes").fetchall()
+        for kind, samples, mean, variance in rows:
+            if samples >= MIN_SAMPLES:
+                estimates[kind] = math.ceil(mean + 2 * math.sqrt(max(variance, 0.0)))
+        return estimates
+
+output_stats = OutputSizeStats("data/batch_stats.sqlite3")
+
+def output_token_budget() -> int:
+    """Output tokens a batch may be planned to use, leaving headroom below the LLM's max_tokens."""
+    return int(LLM_MAX_TOKENS * BATCH_OUTPUT_BUDGET_RATIO)
+
+def pack_batches(input_tokens: List[int], output_tokens: List[int], input_budget: int, output_budget: int,
+                 max_items: int) -> List[List[int]]:
+    """
+    Groups consecutive items into as few batches as possible while each batch stays within the input and
+    output budgets and `max_items`. An item that is too large on its own still gets a batch. Returns the
+    positions of the items in each batch.
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_input = 0
+    current_output = BATCH_OVERHEAD_TOKENS
+    for i, (item_input, item_output) in enumerate(zip(input_tokens, output_tokens)):
+        if current and (current_input + item_input > input_budget or current_output + item_output > output_budget
+                        or len(current) >= max_items):
+            batches.append(current)
+            current, current_input, current_output = [], 0, BATCH_OVERHEAD_TOKENS
+        current.append(i)
+        current_input += item_input
+        current_output += item_output
+    if current:
+        batches.append(current)
+    return batches
+
+def plan_answer_batches(questions: List[Dict[str, Any]]) -> List[List[int]]:
+    """
+    Packs questions, in order, into answer batches sized by their estimated prompt tokens and expected answer
+    tokens (the echoed question plus the learned answer size of its kind).
+    """
+    estimates = output_stats.estimates()
+    input_tokens = [_tokens(question) for question in questions]
+    output_tokens = [tokens + estimates[question_kind(question)] for question, tokens in zip(questions, input_tokens)]
+    return pack_batches(input_tokens, output_tokens, BATCH_INPUT_TOKEN_BUDGET, output_token_budget(), BATCH_MAX_QUESTIONS)
+
+def detection_batch_size() -> int:
+    """Number of questions to ask for per detection call, from the learned size of a detected question."""
+    per_question = output_stats.estimates()["detected_question"]
+    size = (output_token_budget() - BATCH_OVERHEAD_TOKENS) // per_question
+    # Rounded down to a multiple of 5 so small shifts in the learned size keep the prompt (and its cache entry) stable.
+    if size >= 10:
+        size -= size % 5
+    return max(1, min(BATCH_MAX_QUESTIONS, size))
+
+def record_detected_questions(questions: List[Dict[str, Any]]) -> None:
+    for question in questions:
+        output_stats.observe("detected_question", _tokens(question))
+
+def record_answers(questions: List[Dict[str, Any]], answers: List[Dict[str, Any]]) -> None:
+    """Learns answer sizes per question kind from a batch's answers, matched to its questions by number."""
+    by_number = {str(question.get("question_number")): question for question in questions}
+    for answer in answers:
+        question = by_number.get(str(answer.get("question_number")))
+        if question is not None:
+            output_stats.observe(question_kind(question), max(0, _tokens(answer) - _tokens(question)))
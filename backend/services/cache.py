@@ -0,0 +1,88 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+from services.db import SQLiteDatabase
+
+class DiskCache:
+    """
+    Size-bounded key/value cache stored in SQLite. Entries are evicted least recently used first once the
+    stored values exceed `max_bytes`, and expire after `ttl_seconds` when a TTL is given.
+    """
+    def __init__(self, path: str, max_bytes: int, ttl_seconds: Optional[float] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = SQLiteDatabase(
+            path,
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        return self._db.connect()
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached value for a key, or None on a miss."""
+        conn = self._connect()
+        row = conn.execute("SELECT value, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            conn.commit()
+            row = None
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        conn.commit()
+        return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        """Stores a value and evicts the least recently used entries if the cache is over its size limit."""
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (key, value, len(value.encode('utf-8')), now, now)
+        )
+        conn.commit()
+        self._evict(conn)
+
+    def delete(self, key: str) -> None:
+        conn = self._connect()
+        conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+
+        freed = 0
+        evicted = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+            if total_bytes - freed <= self.max_bytes * 0.9:
+                break
+            evicted.append((key,))
+            freed += size
+        conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+        conn.commit()
+        print(f"Evicted {len(evicted)} entries ({freed} bytes) from {os.path.basename(self.path)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss counters and the current size of the cache."""
+        entries, total_bytes = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": total_bytes}
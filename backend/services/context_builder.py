@@ -0,0 +1,142 @@
+import math
+import re
+from typing import Any, Dict, List, Set
+from langchain_core.documents import Document
+from services.index import chunk_file
+
+_WORD_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the token count of a text locally, without a tokenizer round trip.
+    Takes the larger of a word/punctuation count and a characters/4 count, which errs on the high side
+    for both prose and dense OCR text.
+    """
+    if not text:
+        return 0
+    return max(len(_WORD_PATTERN.findall(text)), math.ceil(len(text) / 4))
+
+def _chunk_number(doc: Document) -> int:
+    chunk_id = doc.metadata.get("chunk_id", "")
+    try:
+        return int(chunk_id.rsplit('#', 1)[1])
+    except (IndexError, ValueError):
+        return -1
+
+def _word_set(text: str) -> Set[str]:
+    return set(re.findall(r"\w+", text.lower()))
+
+def _similarity(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def _merge_texts(first: str, second: str, max_overlap: int = 200) -> str:
+    """Joins consecutive chunks of a page, dropping the text the splitter repeated between them."""
+    for size in range(min(max_overlap, len(first), len(second)), 0, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return f"{first}\n{second}"
+
+def source_label(page: str) -> str:
+    """The citation prefix of a passage from `page` (a page label from services.index.page_label)."""
+    return f"Source Chunk {{R{page}}}: "
+
+def _chunk_label(doc: Document) -> str:
+    return source_label(doc.metadata.get('page'))
+
+def assemble_context(retrieved: List[List[Document]], max_tokens: int, mmr_lambda: float = 0.7,
+                     duplicate_threshold: float = 0.9) -> Dict[str, Any]:
+    """
+    Builds the retrieved-context block for a prompt from the ranked results of one or more queries,
+    keeping it within `max_tokens`.
+
+    Chunks are scored by their best reciprocal rank across queries (plus a bonus for every other query that
+    retrieved them) and picked greedily MMR-style, penalising word overlap with chunks already picked.
+    Near-duplicates are dropped outright. Picked chunks that are adjacent on the same page are merged back
+    into one passage. Returns the context text and a report of how much retrieved context was dropped.
+    """
+    candidates: Dict[str, Dict[str, Any]] = {}
+    for docs in retrieved:
+        for rank, doc in enumerate(docs):
+            key = doc.metadata.get("chunk_id", doc.page_content)
+            score = 1.0 / (rank + 1)
+            if key in candidates:
+                candidate = candidates[key]
+                candidate["relevance"] = max(candidate["relevance"], score) + 0.1 * min(candidate["relevance"], score)
+            else:
+                candidates[key] = {
+                    "doc": doc,
+                    "relevance": score,
+                    "words": _word_set(doc.page_content),
+                    "tokens": estimate_tokens(_chunk_label(doc) + doc.page_content),
+                }
+
+    total_tokens = sum(candidate["tokens"] for candidate in candidates.values())
+    remaining = sorted(candidates.values(), key=lambda candidate: -candidate["relevance"])
+    selected: List[Dict[str, Any]] = []
+    used_tokens = 0
+    duplicates = 0
+
+    for candidate in remaining:
+        candidate["redundancy"] = 0.0
+
+    while remaining:
+        # The budget only shrinks, so chunks that no longer fit are dropped for good.
+        remaining = [candidate for candidate in remaining if used_tokens + candidate["tokens"] <= max_tokens]
+        if not remaining:
+            break
+        best = max(
+            remaining,
+            key=lambda candidate: mmr_lambda * candidate["relevance"] - (1 - mmr_lambda) * candidate["redundancy"]
+        )
+        selected.append(best)
+        used_tokens += best["tokens"]
+
+        # Redundancy is the max similarity to any picked chunk, so only the chunk just picked needs comparing.
+        kept = []
+        for candidate in remaining:
+            if candidate is best:
+                continue
+            candidate["redundancy"] = max(candidate["redundancy"], _similarity(candidate["words"], best["words"]))
+            if candidate["redundancy"] >= duplicate_threshold:
+                duplicates += 1
+                continue
+            kept.append(candidate)
+        remaining = kept
+
+    passages = []
+    passage_order: Dict[str, int] = {}
+    for position, candidate in enumerate(selected):
+        passage_order.setdefault(chunk_file(candidate["doc"].metadata.get("chunk_id", "")), position)
+
+    by_page: Dict[str, List[Document]] = {}
+    for candidate in selected:
+        doc = candidate["doc"]
+        by_page.setdefault(chunk_file(doc.metadata.get("chunk_id", "")), []).append(doc)
+
+    for page_file in sorted(by_page, key=lambda page: passage_order[page]):
+        docs = sorted(by_page[page_file], key=_chunk_number)
+        current_doc, current_text = docs[0], docs[0].page_content
+        for previous, doc in zip(docs, docs[1:]):
+            if _chunk_number(previous) >= 0 and _chunk_number(doc) == _chunk_number(previous) + 1:
+                current_text = _merge_texts(current_text, doc.page_content)
+            else:
+                passages.append(_chunk_label(current_doc) + current_text)
+                current_doc, current_text = doc, doc.page_content
+        passages.append(_chunk_label(current_doc) + current_text)
+
+    context = "\n\n".join(passages)
+    return {
+        "context": context,
+        "report": {
+            "retrieved_chunks": len(candidates),
+            "included_chunks": len(selected),
+            "dropped_chunks": len(candidates) - len(selected),
+            "duplicate_chunks": duplicates,
+            "retrieved_tokens": total_tokens,
+            "included_tokens": estimate_tokens(context),
+            "dropped_tokens": total_tokens - used_tokens,
+            "max_tokens": max_tokens,
+        },
+    }
@@ -0,0 +1,26 @@
+import os
+import sqlite3
+import threading
+
+class SQLiteDatabase:
+    """
+    Hands out one SQLite connection per thread to a database file in WAL mode, so readers in other
+    threads and worker processes are not blocked by writers.
+    """
+    def __init__(self, path: str, schema: str = ""):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        if schema:
+            conn = self.connect()
+            conn.executescript(schema)
+            conn.commit()
+
+    def connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from services.metrics import span, record_cache
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class EmbeddingStore:
+    """
+    Append-only store of embedding vectors keyed by a hash of the chunk text and the embedding model.
+    Vectors live in one float32 file that readers memory-map, and `keys.tsv` maps each key to its row,
+    so worker processes share the vectors through the page cache instead of each holding a copy.
+    """
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.directory / "vectors.f32"
+        self.keys_path = self.directory / "keys.tsv"
+        self.meta_path = self.directory / "meta.json"
+        self.lock_path = self.directory / ".lock"
+        self.dimension: Optional[int] = None
+        self._offsets: Dict[str, int] = {}
+        self._keys_read = 0
+        self._vectors: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+
+        if self.meta_path.exists():
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                self.dimension = json.load(f)["dimension"]
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self.lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self) -> None:
+        """Reads key lines appended since the last refresh, including those written by other processes."""
+        if not self.keys_path.exists():
+            return
+        with open(self.keys_path, 'rb') as f:
+            f.seek(self._keys_read)
+            data = f.read()
+        complete = data[:data.rfind(b'\n') + 1]
+        for line in complete.decode('utf-8').splitlines():
+            key, row = line.split('\t')
+            self._offsets[key] = int(row)
+        self._keys_read += len(complete)
+
+        if self.dimension is None and self.meta_path.exists():
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                self.dimension = json.load(f)["dimension"]
+
+    def _row_vectors(self, max_row: int) -> np.memmap:
+        if self._vectors is None or self._vectors.shape[0] <= max_row:
+            rows = os.path.getsize(self.vectors_path) // (4 * self.dimension)
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(rows, self.dimension))
+        return self._vectors
+
+    def get_many(self, keys: List[str]) -> List[Optional[List[float]]]:
+        """Returns the stored vector for each key, or None for keys that have never been embedded."""
+        with self._lock:
+            if any(key not in self._offsets for key in keys):
+                self._refresh()
+            rows = [self._offsets.get(key) for key in keys]
+            found = [row for row in rows if row is not None]
+            if not found:
+                return [None] * len(keys)
+            vectors = self._row_vectors(max(found))
+            return [vectors[row].tolist() if row is not None else None for row in rows]
+
+    def put_many(self, keys: List[str], vectors: List[List[float]]) -> None:
+        """Appends vectors for new keys."""
+        if not keys:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        with self._lock, self._file_lock():
+            self._refresh()
+            if self.dimension is None:
+                self.dimension = int(matrix.shape[1])
+                with open(self.meta_path, 'w', encoding='utf-8') as f:
+                    json.dump({"dimension": self.dimension}, f)
+
+            new_rows = [i for i, key in enumerate(keys) if key not in self._offsets]
+            if not new_rows:
+                return
+            start_row = os.path.getsize(self.vectors_path) // (4 * self.dimension) if self.vectors_path.exists() else 0
+            with open(self.vectors_path, 'ab') as f:
+                f.write(matrix[new_rows].tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.keys_path, 'a', encoding='utf-8') as f:
+                f.write("".join(f"{keys[i]}\t{start_row + n}\n" for n, i in enumerate(new_rows)))
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that only sends texts to the underlying model when they are not in the store.
+    Other attributes (model name, batch size, batched query calls) are delegated to the wrapped client.
+    """
+    def __init__(self, embeddings, store: EmbeddingStore):
+        self.embeddings = embeddings
+        self.store = store
+        self.model = getattr(embeddings, "model", "") or ""
+
+    def __getattr__(self, name):
+        return getattr(self.__dict__["embeddings"], name)
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\n{text}".encode('utf-8')).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        vectors = self.store.get_many(keys)
+
+        missing = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                missing.setdefault(key, text)
+        record_cache("embedding", True, len(texts) - len(missing))
+        record_cache("embedding", False, len(missing))
+        if missing:
+            print(f"Embedding {len(missing)} new chunks ({len(texts) - len(missing)} cached)")
+            with span("embedding"):
+                embedded = self.embeddings.embed_documents(list(missing.values()))
+            self.store.put_many(list(missing.keys()), embedded)
+            embedded_by_key = dict(zip(missing.keys(), embedded))
+            vectors = [vector if vector is not None else embedded_by_key[key] for key, vector in zip(keys, vectors)]
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+_stores: Dict[str, EmbeddingStore] = {}
+_stores_lock = threading.Lock()
+
+def cached_embeddings(embeddings) -> CachedEmbeddings:
+    """
+    Wraps an embeddings client with the shared store of its model under data/embeddings.
+    """
+    model = getattr(embeddings, "model", "") or "default"
+    with _stores_lock:
+        if model not in _stores:
+            _stores[model] = EmbeddingStore(f"data/embeddings/{re.sub(r'[^A-Za-z0-9_.-]', '_', model)}")
+        return CachedEmbeddings(embeddings, _stores[model])
@@ -0,0 +1,112 @@
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+from services.db import SQLiteDatabase
+from config import HISTORY_MAX_ENTRIES_PER_SOURCE, HISTORY_INLINE_MAX_BYTES
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source_name TEXT NOT NULL,
+    user_message TEXT NOT NULL,
+    response TEXT,
+    body_id INTEGER,
+    response_bytes INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_source_id ON history (source_name, id);
+CREATE TABLE IF NOT EXISTS history_bodies (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    body BLOB NOT NULL
+);
+"""
+
+class HistoryStore:
+    """
+    Chat history per source in SQLite. Only the newest `max_entries_per_source` exchanges of a source are kept,
+    and responses larger than `inline_max_bytes` are compressed into a separate table so listing and
+    counting do not read them.
+    """
+    def __init__(self, path: str, max_entries_per_source: int, inline_max_bytes: int):
+        self.max_entries_per_source = max_entries_per_source
+        self.inline_max_bytes = inline_max_bytes
+        self._db = SQLiteDatabase(path, HISTORY_SCHEMA)
+
+    def add(self, source_name: str, user_message: str, response: str) -> int:
+        """Appends an exchange and drops the oldest exchanges of the source beyond the retention limit."""
+        conn = self._db.connect()
+        encoded = response.encode('utf-8')
+        body_id = None
+        if len(encoded) > self.inline_max_bytes:
+            body_id = conn.execute("INSERT INTO history_bodies (body) VALUES (?)", (zlib.compress(encoded),)).lastrowid
+            response = None
+        entry_id = conn.execute(
+            "INSERT INTO history (source_name, user_message, response, body_id, response_bytes, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (source_name, user_message, response, body_id, len(encoded), time.time())
+        ).lastrowid
+        self._apply_retention(conn, source_name)
+        conn.commit()
+        return entry_id
+
+    def _apply_retention(self, conn, source_name: str) -> None:
+        if self.max_entries_per_source <= 0:
+            return
+        expired = conn.execute(
+            "SELECT id, body_id FROM history WHERE source_name = ? ORDER BY id DESC LIMIT -1 OFFSET ?",
+            (source_name, self.max_entries_per_source)
+        ).fetchall()
+        self._delete(conn, expired)
+
+    @staticmethod
+    def _delete(conn, rows: List[Tuple[int, Optional[int]]]) -> None:
+        conn.executemany("DELETE FROM history WHERE id = ?", [(row[0],) for row in rows])
+        conn.executemany("DELETE FROM history_bodies WHERE id = ?", [(row[1],) for row in rows if row[1] is not None])
+
+    def list(self, source_name: str, limit: int = 50, before: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Returns up to `limit` exchanges older than the `before` cursor (the newest ones without a cursor)
+        in chronological order, and the cursor of the next older page or None when there is none.
+        """
+        conn = self._db.connect()
+        rows = conn.execute(
+            "SELECT id, user_message, response, body_id, created_at FROM history "
+            "WHERE source_name = ? AND id < ? ORDER BY id DESC LIMIT ?",
+            (source_name, before if before is not None else 2 ** 63 - 1, limit + 1)
+        ).fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        body_ids = [row[3] for row in rows if row[3] is not None]
+        bodies = {}
+        if body_ids:
+            placeholders = ",".join("?" * len(body_ids))
+            for body_id, body in conn.execute(f"SELECT id, body FROM history_bodies WHERE id IN ({placeholders})", body_ids):
+                bodies[body_id] = zlib.decompress(body).decode('utf-8')
+
+        entries = [
+            {
+                "id": row[0],
+                "user": row[1],
+                "assistant": row[2] if row[3] is None else bodies.get(row[3], ""),
+                "created_at": row[4],
+            }
+            for row in reversed(rows)
+        ]
+        return entries, rows[-1][0] if has_more else None
+
+    def count(self, source_name: str) -> int:
+        return self._db.connect().execute("SELECT COUNT(*) FROM history WHERE source_name = ?", (source_name,)).fetchone()[0]
+
+    def clear(self, source_name: str) -> int:
+        """Deletes every exchange of a source. Returns how many were deleted."""
+        conn = self._db.connect()
+        rows = conn.execute("SELECT id, body_id FROM history WHERE source_name = ?", (source_name,)).fetchall()
+        self._delete(conn, rows)
+        conn.commit()
+        return len(rows)
+
+history_store = HistoryStore(
+    "data/history.sqlite3",
+    max_entries_per_source=HISTORY_MAX_ENTRIES_PER_SOURCE,
+    inline_max_bytes=HISTORY_INLINE_MAX_BYTES
+)
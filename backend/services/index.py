@@ -0,0 +1,282 @@
+import faiss
+import hashlib
+import numpy as np
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import weakref
+from pathlib import Path
+from typing import Dict, List, Optional
+from langchain_core.documents import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.vectorstores import FAISS
+from services.metrics import span
+
+INDEX_DIR_NAME = ".index"
+HASHES_FILE_NAME = "hashes.json"
+META_FILE_NAME = "meta.json"
+
+_text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
+
+# Weak values: a source's lock lives only while someone holds or waits for it, so locks of sources that
+# are no longer used (or were deleted) do not pile up.
+_source_locks: "weakref.WeakValueDictionary[str, threading.RLock]" = weakref.WeakValueDictionary()
+_source_locks_guard = threading.Lock()
+
+def source_lock(source_name: str) -> threading.RLock:
+    """
+    Returns the lock guarding the on-disk index of a source.
+    """
+    with _source_locks_guard:
+        lock = _source_locks.get(source_name)
+        if lock is None:
+            lock = threading.RLock()
+            _source_locks[source_name] = lock
+        return lock
+
+def _index_root(source_name: str) -> Path:
+    return Path(f"uploads/sources/{source_name}") / INDEX_DIR_NAME
+
+def file_sha256(file_path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _write_json_atomic(path: Path, data) -> None:
+    temp_fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    with os.fdopen(temp_fd, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
+def source_fingerprint(source_name: str, embedding_model: str = "") -> str:
+    """
+    Computes a content hash of every file in the source folder together with the embedding model.
+    Per-file hashes are cached by size and mtime so unchanged files are not re-read.
+    """
+    source_dir = Path(f"uploads/sources/{source_name}")
+    index_root = _index_root(source_name)
+    hashes_path = index_root / HASHES_FILE_NAME
+
+    cached_hashes = {}
+    if hashes_path.exists():
+        try:
+            with open(hashes_path, 'r', encoding='utf-8') as f:
+                cached_hashes = json.load(f)
+        except (OSError, ValueError):
+            cached_hashes = {}
+
+    file_hashes = {}
+    for file in sorted(os.listdir(source_dir)):
+        file_path = source_dir / file
+        if file.startswith('.') or not file_path.is_file():
+            continue
+        stat = file_path.stat()
+        cached = cached_hashes.get(file)
+        if cached and cached.get("size") == stat.st_size and cached.get("mtime") == stat.st_mtime_ns:
+            file_hashes[file] = cached
+        else:
+            file_hashes[file] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": file_sha256(file_path)}
+
+    if file_hashes != cached_hashes:
+        index_root.mkdir(exist_ok=True)
+        _write_json_atomic(hashes_path, file_hashes)
+
+    fingerprint = hashlib.sha256(embedding_model.encode('utf-8'))
+    for file, entry in file_hashes.items():
+        fingerprint.update(f"\n{file}:{entry['sha256']}".encode('utf-8'))
+    return fingerprint.hexdigest()
+
+def page_label(file: str) -> str:
+    """Returns the stable label a page is cited by."""
+    return os.path.splitext(file)[0]
+
+def split_page(file: str, text: str) -> List[Document]:
+    """
+    Splits one page into chunks with stable ids of the form '<file>#<chunk number>'.
+    """
+    return [
+        Document(page_content=chunk, metadata={"source_id": file, "page": page_label(file), "chunk_id": f"{file}#{n}"})
+        for n, chunk in enumerate(_text_splitter.split_text(text))
+    ]
+
+def chunk_file(chunk_id: str) -> str:
+    """Returns the page file a chunk id belongs to."""
+    return chunk_id.rsplit('#', 1)[0]
+
+def build_index(pages: Dict[str, str], embeddings) -> Optional[FAISS]:
+    """
+    Builds a FAISS index over every page. Returns None when the pages contain no text.
+    """
+    with span("chunking"):
+        docs = [doc for file, text in pages.items() for doc in split_page(file, text)]
+    if not docs:
+        return None
+    with span("index_build"):
+        return FAISS.from_documents(docs, embeddings, ids=[doc.metadata["chunk_id"] for doc in docs])
+
+def embed_queries(embeddings, queries: List[str]) -> List[List[float]]:
+    """
+    Embeds several queries with as few embedding requests as the client allows.
+    Clients without a batched query call fall back to one embed_query call per query.
+    """
+    embed = getattr(embeddings, "_embed", None)
+    if embed is None:
+        return [embeddings.embed_query(query) for query in queries]
+
+    batch_size = getattr(embeddings, "max_batch_size", None) or 50
+    vectors = []
+    for i in range(0, len(queries), batch_size):
+        vectors.extend(embed(queries[i:i + batch_size], model_type="query"))
+    return vectors
+
+def search_many(vectorstore: FAISS, embeddings, queries: List[str], k: int = 20) -> List[List[Document]]:
+    """
+    Runs a single FAISS search over the matrix of query embeddings and returns the top-k chunks per query.
+    """
+    if not queries:
+        return []
+    with span("embedding_query"):
+        vectors = np.array(embed_queries(embeddings, queries), dtype=np.float32)
+    with span("faiss_search"):
+        if getattr(vectorstore, "_normalize_L2", False):
+            faiss.normalize_L2(vectors)
+        _, indices = vectorstore.index.search(vectors, k)
+
+    results = []
+    for row in indices:
+        docs = []
+        for i in row:
+            if i == -1:
+                continue
+            doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[i])
+            if isinstance(doc, Document):
+                docs.append(doc)
+        results.append(docs)
+    return results
+
+def _read_index(index_path: Path, embeddings, mmap: bool = True) -> FAISS:
+    index = None
+    if mmap:
+        try:
+            index = faiss.read_index(str(index_path / "index.faiss"), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            index = None
+    if index is None:
+        index = faiss.read_index(str(index_path / "index.faiss"))
+    with open(index_path / "index.pkl", 'rb') as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+def _latest_index_path(source_name: str) -> Optional[Path]:
+    index_root = _index_root(source_name)
+    if not index_root.exists():
+        return None
+    candidates = [
+        entry for entry in index_root.iterdir()
+        if entry.is_dir() and not entry.name.startswith('.') and (entry / META_FILE_NAME).exists()
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda entry: entry.stat().st_mtime_ns)
+
+def indexed_pages(source_name: str) -> List[str]:
+    """Returns the page files covered by the latest persisted index of a source."""
+    latest_path = _latest_index_path(source_name)
+    if latest_path is None:
+        return []
+    try:
+        with open(latest_path / META_FILE_NAME, 'r', encoding='utf-8') as f:
+            return json.load(f).get("pages", [])
+    except (OSError, ValueError):
+        return []
+
+def index_exists(source_name: str, fingerprint: str) -> bool:
+    """Whether an index has been persisted for this fingerprint."""
+    index_path = _index_root(source_name) / fingerprint
+    return (index_path / "index.faiss").exists() and (index_path / "index.pkl").exists()
+
+def load_index(source_name: str, fingerprint: str, embeddings) -> Optional[FAISS]:
+    """
+    Loads the persisted FAISS index matching the fingerprint, memory-mapping the vectors where FAISS supports it.
+    Returns None when no index has been saved for this fingerprint.
+    """
+    index_path = _index_root(source_name) / fingerprint
+    if not index_exists(source_name, fingerprint):
+        return None
+
+    try:
+        with span("index_load"):
+            return _read_index(index_path, embeddings)
+    except Exception as e:
+        print(f"Failed to load index for {source_name}: {e}")
+        return None
+
+def save_index(source_name: str, fingerprint: str, vectorstore: FAISS, pages: List[str], embedding_model: str = "") -> None:
+    """
+    Persists the FAISS index under the fingerprint and removes indexes saved for older fingerprints.
+    """
+    index_root = _index_root(source_name)
+    index_root.mkdir(exist_ok=True)
+    index_path = index_root / fingerprint
+
+    if not index_path.exists():
+        temp_path = tempfile.mkdtemp(dir=index_root, prefix=".tmp-")
+        try:
+            vectorstore.save_local(temp_path)
+            _write_json_atomic(Path(temp_path) / META_FILE_NAME, {"model": embedding_model, "pages": sorted(pages)})
+            os.rename(temp_path, index_path)
+        except OSError as e:
+            print(f"Failed to save index for {source_name}: {e}")
+            shutil.rmtree(temp_path, ignore_errors=True)
+            return
+
+    for entry in index_root.iterdir():
+        if entry.is_dir() and entry.name != fingerprint and not entry.name.startswith('.'):
+            shutil.rmtree(entry, ignore_errors=True)
+
+def update_index(source_name: str, embeddings, pages: List[str], added: Optional[Dict[str, str]] = None,
+                 removed: Optional[List[str]] = None) -> bool:
+    """
+    Applies added and removed pages to the latest persisted index and saves it under the new fingerprint.
+    `pages` is the full list of page files now in the source. Returns False when no compatible index
+    exists, in which case the next load rebuilds the index from scratch.
+    """
+    added = added or {}
+    removed = removed or []
+    embedding_model = getattr(embeddings, "model", "") or ""
+
+    with source_lock(source_name):
+        latest_path = _latest_index_path(source_name)
+        if latest_path is None:
+            return False
+
+        with open(latest_path / META_FILE_NAME, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        expected_pages = (set(meta.get("pages", [])) | set(added)) - set(removed)
+        if meta.get("model") != embedding_model or expected_pages != set(pages):
+            print(f"Persisted index for {source_name} is out of date, skipping incremental update")
+            return False
+
+        vectorstore = _read_index(latest_path, embeddings, mmap=False)
+        changed_files = set(added) | set(removed)
+        stale_ids = [
+            chunk_id for chunk_id in vectorstore.index_to_docstore_id.values()
+            if chunk_file(chunk_id) in changed_files
+        ]
+        if stale_ids:
+            vectorstore.delete(stale_ids)
+
+        with span("chunking"):
+            docs = [doc for file, text in added.items() for doc in split_page(file, text)]
+        if docs:
+            vectorstore.add_documents(docs, ids=[doc.metadata["chunk_id"] for doc in docs])
+
+        fingerprint = source_fingerprint(source_name, embedding_model)
+        save_index(source_name, fingerprint, vectorstore, pages, embedding_model)
+        print(f"Updated index for {source_name}: +{len(docs)} chunks, -{len(stale_ids)} chunks")
+        return True
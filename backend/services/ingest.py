@@ -0,0 +1,98 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+from services.jobs import JobStore, check_lease
+from services.source import list_source_pages, read_source_page
+from services.index import update_index
+from services.providers import create_embeddings
+from services.registry import assistant_registry
+from services.metrics import span
+from services.manifest import refresh_manifest
+from services.thumbnails import generate_thumbnails
+from config import OCR_CONCURRENCY
+
+def run_ingest_job(store: JobStore, job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Background handler for "ingest" jobs: pre-processes and OCRs every uploaded file in parallel, then chunks,
+    embeds and appends the new pages to the persisted index, refreshes the manifest and, when every file was
+    OCRed, warms the assistant, so the first question does not pay for any of it. Per-file status is kept in
+    the job's progress.
+    """
+    source_name = job["source_name"]
+    files = job["payload"]["files"]
+    progress = {
+        "total_files": len(files),
+        "ocr_completed": 0,
+        "failed": 0,
+        "stage": "ocr",
+        "files": {file: {"status": "queued"} for file in files},
+    }
+    lock = threading.Lock()
+
+    def set_status(file: str, **fields) -> None:
+        with lock:
+            progress["files"][file].update(fields)
+            if fields.get("status") == "ocr_done":
+                progress["ocr_completed"] += 1
+            elif fields.get("status") == "failed":
+                progress["failed"] += 1
+            store.update(job["id"], progress=progress)
+
+    texts: Dict[str, str] = {}
+
+    def ocr_one(file: str) -> None:
+        if job["lease_lost"].is_set():
+            return
+        set_status(file, status="ocr")
+        try:
+            text = read_source_page(source_name, file, raise_errors=True)
+        except Exception as e:
+            print(f"Ingest OCR failed for {file} in {source_name}: {e}")
+            set_status(file, status="failed", error=str(e))
+            return
+        texts[file] = text
+        set_status(file, status="ocr_done", characters=len(text))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(OCR_CONCURRENCY, len(files)))) as executor:
+        list(executor.map(lambda file: contextvars.copy_context().run(ocr_one, file), files))
+    check_lease(job)
+
+    with lock:
+        progress["stage"] = "indexing"
+        store.update(job["id"], progress=progress)
+
+    failed = set(files) - set(texts)
+    pages = [page for page in list_source_pages(source_name) if page not in failed]
+    try:
+        updated = update_index(source_name, create_embeddings(), pages, added=texts) if texts else True
+    except Exception as e:
+        print(f"Incremental index update failed for {source_name}: {e}")
+        updated = False
+
+    refresh_manifest(source_name)
+    assistant_registry.invalidate(source_name)
+    # Warming would OCR the failed files again right away; they are retried when the source is next loaded.
+    # Without a compatible persisted index, building the assistant rebuilds it from the OCR text cached above.
+    assistant = None
+    if not failed:
+        with span("ingest_warm"):
+            assistant = assistant_registry.get(source_name)
+
+    generate_thumbnails(source_name, [file for file in files if file not in failed])
+    for file in texts:
+        set_status(file, status="indexed")
+    with lock:
+        progress["stage"] = "done"
+        store.update(job["id"], progress=progress)
+
+    result = {
+        "source_name": source_name,
+        "indexed_files": sorted(texts),
+        "failed_files": {file: progress["files"][file].get("error") for file in sorted(failed)},
+        "incremental": updated,
+        "ready": assistant is not None and assistant.vectorstore is not None,
+    }
+    if not texts:
+        result["error"] = "OCR failed for every uploaded file"
+    return result
@@ -0,0 +1,266 @@
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from services.db import SQLiteDatabase
+from services.metrics import labelled
+from config import JOB_WORKERS, JOB_LEASE_SECONDS
+
+JOB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    source_name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    progress TEXT,
+    result TEXT,
+    error TEXT,
+    owner TEXT,
+    lease_until REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE TABLE IF NOT EXISTS job_batches (
+    job_id TEXT NOT NULL,
+    batch_key TEXT NOT NULL,
+    section TEXT,
+    question_indices TEXT NOT NULL,
+    answers TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (job_id, batch_key)
+);
+"""
+
+class JobStore:
+    """
+    Persistent table of background jobs and the answer batches they have completed so far.
+    A job is run by the process that claims it; the claim is a lease that the owner renews while it runs,
+    so jobs of a process that died are picked up by another one once the lease expires.
+    """
+    def __init__(self, path: str, lease_seconds: float = 60):
+        self._db = SQLiteDatabase(path, JOB_SCHEMA)
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def create(self, kind: str, source_name: str, payload: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._db.connect()
+        conn.execute(
+            "INSERT INTO jobs (id, kind, source_name, status, payload, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+            (job_id, kind, source_name, json.dumps(payload), now, now)
+        )
+        conn.commit()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._db.connect().execute(
+            "SELECT id, kind, source_name, status, payload, progress, result, error, created_at, updated_at FROM jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "kind": row[1],
+            "source_name": row[2],
+            "status": row[3],
+            "payload": json.loads(row[4]),
+            "progress": json.loads(row[5]) if row[5] else None,
+            "result": json.loads(row[6]) if row[6] else None,
+            "error": row[7],
+            "created_at": row[8],
+            "updated_at": row[9],
+        }
+
+    def update(self, job_id: str, **fields) -> None:
+        """Updates job columns; dict values are stored as JSON."""
+        columns = []
+        values = []
+        for column, value in fields.items():
+            columns.append(f"{column} = ?")
+            values.append(json.dumps(value) if isinstance(value, (dict, list)) else value)
+        columns.append("updated_at = ?")
+        values.extend([time.time(), job_id])
+        conn = self._db.connect()
+        conn.execute(f"UPDATE jobs SET {', '.join(columns)} WHERE id = ?", values)
+        conn.commit()
+
+    def unfinished_job_ids(self) -> List[str]:
+        """Jobs that are queued or whose owner's lease has expired, i.e. that this process may claim."""
+        rows = self._db.connect().execute(
+            "SELECT id FROM jobs WHERE status = 'queued' OR (status = 'running' AND COALESCE(lease_until, 0) < ?) "
+            "ORDER BY created_at",
+            (time.time(),)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def claim(self, job_id: str) -> bool:
+        """
+        Atomically marks a queued job, or a running job with an expired lease, as running under this process.
+        Returns False when another process holds it or it has finished.
+        """
+        now = time.time()
+        conn = self._db.connect()
+        cursor = conn.execute(
+            "UPDATE jobs SET status = 'running', owner = ?, lease_until = ?, updated_at = ? "
+            "WHERE id = ? AND (status = 'queued' OR (status = 'running' AND COALESCE(lease_until, 0) < ?))",
+            (self.owner, now + self.lease_seconds, now, job_id, now)
+        )
+        conn.commit()
+        return cursor.rowcount == 1
+
+    def renew(self, job_id: str) -> bool:
+        """Extends this process's lease on a running job. Returns False when the lease was lost."""
+        conn = self._db.connect()
+        cursor = conn.execute(
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND owner = ? AND status = 'running'",
+            (time.time() + self.lease_seconds, job_id, self.owner)
+        )
+        conn.commit()
+        return cursor.rowcount == 1
+
+    def finish(self, job_id: str, **fields) -> bool:
+        """
+        Records the final status of a job, but only while this process still holds its lease. Returns False
+        when the lease was lost, i.e. another process may have claimed and re-run the job.
+        """
+        columns = ["lease_until = NULL"]
+        values = []
+        for column, value in fields.items():
+            columns.append(f"{column} = ?")
+            values.append(json.dumps(value) if isinstance(value, (dict, list)) else value)
+        columns.append("updated_at = ?")
+        now = time.time()
+        values.extend([now, job_id, self.owner, now])
+        conn = self._db.connect()
+        cursor = conn.execute(
+            f"UPDATE jobs SET {', '.join(columns)} WHERE id = ? AND owner = ? AND status = 'running' AND lease_until >= ?",
+            values
+        )
+        conn.commit()
+        return cursor.rowcount == 1
+
+    def add_batch(self, job_id: str, section: str, question_indices: List[int], answers: List[Dict[str, Any]]) -> None:
+        conn = self._db.connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO job_batches (job_id, batch_key, section, question_indices, answers, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, ",".join(str(i) for i in question_indices), section, json.dumps(question_indices), json.dumps(answers), time.time())
+        )
+        conn.commit()
+
+    def get_batches(self, job_id: str) -> List[Dict[str, Any]]:
+        """Returns the completed batches of a job in the same shape as stream_answers "batch" events."""
+        rows = self._db.connect().execute(
+            "SELECT section, question_indices, answers FROM job_batches WHERE job_id = ? ORDER BY created_at",
+            (job_id,)
+        ).fetchall()
+        return [
+            {"section": row[0], "question_indices": json.loads(row[1]), "answers": json.loads(row[2])}
+            for row in rows
+        ]
+
+class LeaseLost(Exception):
+    """Raised by a job handler that finds its lease lost, so it stops without finishing the job."""
+
+def check_lease(job: Dict[str, Any]) -> None:
+    """Raises LeaseLost once the heartbeat of a running job has lost its lease. Handlers call it between steps."""
+    lease_lost = job.get("lease_lost")
+    if lease_lost is not None and lease_lost.is_set():
+        raise LeaseLost(f"Lost the lease on job {job['id']}")
+
+class JobQueue:
+    """
+    Runs jobs from a JobStore on a local worker pool. Handlers are registered per job kind and receive
+    the store and the job, so they can record progress and completed batches as they go. A handler should
+    call check_lease(job) between steps so it stops once another process may have taken the job over.
+    """
+    def __init__(self, store: JobStore, max_workers: int):
+        self.store = store
+        self.handlers: Dict[str, Callable[[JobStore, Dict[str, Any]], Any]] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._watcher: Optional[threading.Thread] = None
+
+    def register(self, kind: str, handler: Callable[[JobStore, Dict[str, Any]], Any]) -> None:
+        self.handlers[kind] = handler
+
+    def submit(self, kind: str, source_name: str, payload: Dict[str, Any]) -> str:
+        job_id = self.store.create(kind, source_name, payload)
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def resume(self) -> int:
+        """
+        Re-queues jobs left queued, or running under an expired lease, by a previous process, and keeps
+        checking for jobs orphaned later. Each job is claimed atomically, so with several worker processes
+        only one of them runs it. Returns how many jobs were found.
+        """
+        job_ids = self._resume_unfinished()
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch_orphans, name="job-watcher", daemon=True)
+            self._watcher.start()
+        return len(job_ids)
+
+    def _resume_unfinished(self) -> List[str]:
+        job_ids = self.store.unfinished_job_ids()
+        for job_id in job_ids:
+            self._executor.submit(self._run, job_id)
+        if job_ids:
+            print(f"Resuming {len(job_ids)} unfinished jobs")
+        return job_ids
+
+    def _watch_orphans(self) -> None:
+        while True:
+            time.sleep(self.store.lease_seconds)
+            try:
+                self._resume_unfinished()
+            except Exception as e:
+                print(f"Failed to check for orphaned jobs: {e}")
+
+    def _heartbeat(self, job_id: str, done: threading.Event, lease_lost: threading.Event) -> None:
+        while not done.wait(self.store.lease_seconds / 3):
+            if not self.store.renew(job_id):
+                print(f"Lost the lease on job {job_id}")
+                lease_lost.set()
+                return
+
+    def _run(self, job_id: str) -> None:
+        if not self.store.claim(job_id):
+            return
+        job = self.store.get(job_id)
+        if job is None:
+            return
+        handler = self.handlers.get(job["kind"])
+        if handler is None:
+            self.store.finish(job_id, status="failed", error=f"Unknown job kind: {job['kind']}")
+            return
+
+        done = threading.Event()
+        job["lease_lost"] = threading.Event()
+        threading.Thread(
+            target=self._heartbeat, args=(job_id, done, job["lease_lost"]), name=f"job-lease-{job_id[:8]}", daemon=True
+        ).start()
+        try:
+            with labelled(f"job:{job['kind']}", job["source_name"]):
+                result = handler(self.store, job)
+            if isinstance(result, dict) and result.get("error"):
+                finished = self.store.finish(job_id, status="failed", error=result["error"], result=result)
+            else:
+                finished = self.store.finish(job_id, status="completed", result=result)
+        except LeaseLost:
+            finished = False
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            finished = self.store.finish(job_id, status="failed", error=str(e))
+        finally:
+            done.set()
+        if not finished:
+            print(f"Dropped the result of job {job_id}: its lease was lost to another worker")
+
+job_queue = JobQueue(JobStore("data/jobs.sqlite3", lease_seconds=JOB_LEASE_SECONDS), max_workers=JOB_WORKERS)
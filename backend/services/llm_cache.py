@@ -0,0 +1,77 @@
+import contextvars
+import hashlib
+import json
+from contextlib import contextmanager
+from typing import Any
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from services.cache import DiskCache
+from services.context_builder import estimate_tokens
+from services.metrics import span, record_cache, record_tokens
+from config import LLM_CACHE_MAX_MB, LLM_CACHE_TTL_SECONDS
+
+llm_cache = DiskCache(
+    "data/cache/llm.sqlite3",
+    max_bytes=LLM_CACHE_MAX_MB * 1024 * 1024,
+    ttl_seconds=LLM_CACHE_TTL_SECONDS or None
+)
+
+llm_cache_bypass = contextvars.ContextVar("llm_cache_bypass", default=False)
+
+@contextmanager
+def bypass_llm_cache(enabled: bool = True):
+    """Skips cached LLM responses for calls made inside the block. Fresh responses are still stored."""
+    token = llm_cache_bypass.set(enabled)
+    try:
+        yield
+    finally:
+        llm_cache_bypass.reset(token)
+
+def llm_cache_key(model: str, messages) -> str:
+    """
+    Hashes the model name and the rendered prompt messages.
+    """
+    rendered = [(message.type, message.content) for message in messages]
+    return hashlib.sha256(json.dumps([model, rendered], ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def cached_llm(llm, parser=None) -> RunnableLambda:
+    """
+    Wraps a chat model so identical prompts to the same model are answered from the disk cache.
+    Accepts a prompt value or a list of messages, like the model itself.
+    With a `parser` the wrapper returns the parsed result, and a response is only cached once it parses, so
+    malformed or truncated output is never replayed; a cached response that fails to parse is dropped.
+    """
+    model = getattr(llm, "model", "") or ""
+
+    def invoke(prompt: Any) -> Any:
+        messages = prompt.to_messages() if hasattr(prompt, "to_messages") else prompt
+        key = llm_cache_key(model, messages)
+        if not llm_cache_bypass.get():
+            cached = llm_cache.get(key)
+            record_cache("llm", cached is not None)
+            if cached is not None:
+                if parser is None:
+                    return AIMessage(content=cached)
+                try:
+                    return parser.invoke(AIMessage(content=cached))
+                except Exception as e:
+                    print(f"Dropping cached LLM response that no longer parses: {e}")
+                    llm_cache.delete(key)
+
+        with span("llm"):
+            response = llm.invoke(messages)
+        usage = getattr(response, "usage_metadata", None) or {}
+        record_tokens(
+            model,
+            usage.get("input_tokens") or sum(estimate_tokens(str(message.content)) for message in messages),
+            usage.get("output_tokens") or estimate_tokens(str(response.content))
+        )
+        if parser is None:
+            llm_cache.set(key, response.content)
+            return response
+
+        result = parser.invoke(response)
+        llm_cache.set(key, response.content)
+        return result
+
+    return RunnableLambda(invoke)
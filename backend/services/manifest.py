@@ -0,0 +1,122 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from services.index import source_lock, indexed_pages, file_sha256
+
+SOURCES_DIR = "uploads/sources"
+MANIFEST_FILE_NAME = ".manifest.json"
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+_cache: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+_cache_lock = threading.Lock()
+
+def _manifest_path(source_name: str) -> Path:
+    return Path(SOURCES_DIR) / source_name / MANIFEST_FILE_NAME
+
+def _text_file_name(file: str) -> str:
+    return '.'.join(file.lower().split('.')[:-1]) + ".txt"
+
+def list_source_names() -> List[str]:
+    """Lists source folders in name order."""
+    if not os.path.isdir(SOURCES_DIR):
+        return []
+    return sorted(
+        entry.name for entry in os.scandir(SOURCES_DIR)
+        if entry.is_dir() and not entry.name.startswith('.')
+    )
+
+def refresh_manifest(source_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Rescans a source folder and rewrites its manifest: every image with its size, content hash and OCR and
+    index status. Hashes are reused for files whose size and mtime are unchanged, and the version counter is
+    only bumped when something changed. Returns None when the source does not exist.
+    """
+    source_dir = Path(SOURCES_DIR) / source_name
+    if not source_dir.is_dir():
+        with _cache_lock:
+            _cache.pop(source_name, None)
+        return None
+
+    with source_lock(source_name):
+        previous = _read_manifest(source_name) or {"version": 0, "files": {}}
+        entries = {entry.name: entry for entry in os.scandir(source_dir) if entry.is_file()}
+        indexed = set(indexed_pages(source_name))
+
+        files = {}
+        for name in sorted(entries):
+            if name.startswith('.') or not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            stat = entries[name].stat()
+            old = previous["files"].get(name, {})
+            if old.get("size") == stat.st_size and old.get("mtime") == stat.st_mtime_ns:
+                sha256 = old["sha256"]
+            else:
+                sha256 = file_sha256(source_dir / name)
+            files[name] = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+                "sha256": sha256,
+                "ocr": _text_file_name(name) in entries,
+                "indexed": name in indexed,
+            }
+
+        if files == previous["files"] and previous["version"]:
+            return previous
+
+        manifest = {
+            "name": source_name,
+            "version": previous["version"] + 1,
+            "updated_at": time.time(),
+            "page_count": len(files),
+            "total_bytes": sum(entry["size"] for entry in files.values()),
+            "ocr_pages": sum(1 for entry in files.values() if entry["ocr"]),
+            "indexed_pages": sum(1 for entry in files.values() if entry["indexed"]),
+            "files": files,
+        }
+        manifest_path = _manifest_path(source_name)
+        temp_fd, temp_path = tempfile.mkstemp(dir=source_dir, prefix=".tmp-")
+        with os.fdopen(temp_fd, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, manifest_path)
+        with _cache_lock:
+            _cache[source_name] = (manifest_path.stat().st_mtime_ns, manifest)
+        return manifest
+
+def _read_manifest(source_name: str) -> Optional[Dict[str, Any]]:
+    manifest_path = _manifest_path(source_name)
+    try:
+        mtime = manifest_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _cache_lock:
+        cached = _cache.get(source_name)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    with _cache_lock:
+        _cache[source_name] = (mtime, manifest)
+    return manifest
+
+def get_manifest(source_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns the manifest of a source, building it on first use. Reads are served from memory while the
+    manifest file is unchanged, so other worker processes' updates are picked up through its mtime.
+    """
+    return _read_manifest(source_name) or refresh_manifest(source_name)
+
+def manifest_summary(manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """The manifest without its per-file entries, as returned in source listings."""
+    return {key: value for key, value in manifest.items() if key != "files"}
+
+def delete_manifest(source_name: str) -> None:
+    """Forgets the cached manifest of a deleted source; the file itself goes with the source folder."""
+    with _cache_lock:
+        _cache.pop(source_name, None)
@@ -0,0 +1,172 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from langchain_core.runnables import RunnableLambda
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+class MetricsRegistry:
+    """
+    In-process counters and histograms rendered in the Prometheus text exposition format.
+    Each worker process keeps its own registry, so scrape every worker (or aggregate by instance).
+    """
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Dict[str, Any]]] = {}
+
+    def describe(self, name: str, metric_type: str, help_text: str) -> None:
+        self._help[name] = (metric_type, help_text)
+
+    @staticmethod
+    def _key(labels: Dict[str, Any]) -> LabelKey:
+        return tuple(sorted((label, "" if value is None else str(value)) for label, value in labels.items()))
+
+    def inc(self, name: str, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                histogram["buckets"][index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    @staticmethod
+    def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(key) + ([extra] if extra else [])
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{label}="{_escape(value)}"' for label, value in pairs) + "}"
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name in sorted(self._counters):
+                metric_type, help_text = self._help.get(name, ("counter", ""))
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for key, value in sorted(self._counters[name].items()):
+                    lines.append(f"{name}{self._format_labels(key)} {value:g}")
+
+            for name in sorted(self._histograms):
+                _, help_text = self._help.get(name, ("histogram", ""))
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in sorted(self._histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(self.buckets, histogram["buckets"]):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{self._format_labels(key, ('le', f'{bound:g}'))} {cumulative}")
+                    lines.append(f"{name}_bucket{self._format_labels(key, ('le', '+Inf'))} {histogram['count']}")
+                    lines.append(f"{name}_sum{self._format_labels(key)} {histogram['sum']:g}")
+                    lines.append(f"{name}_count{self._format_labels(key)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+metrics.describe("assistant_stage_duration_seconds", "histogram", "Duration of pipeline stages.")
+metrics.describe("assistant_stage_errors_total", "counter", "Pipeline stages that raised an error.")
+metrics.describe("assistant_llm_tokens_total", "counter", "Prompt and completion tokens of live LLM calls.")
+metrics.describe("assistant_cache_requests_total", "counter", "Cache lookups by cache and result (hit or miss).")
+metrics.describe("assistant_http_request_duration_seconds", "histogram", "Duration of HTTP requests.")
+metrics.describe("assistant_ocr_preprocess_bytes_saved_total", "counter", "Bytes removed from images by OCR pre-processing.")
+metrics.describe("assistant_output_parse_total", "counter", "LLM outputs parsed, by result (valid, repaired, partial or failed).")
+
+# Route and source of the request being served, copied into worker threads with the rest of the context.
+request_labels: contextvars.ContextVar[Dict[str, str]] = contextvars.ContextVar(
+    "request_labels", default={"route": "", "source": ""}
+)
+# Stage timings of the current request; only collected when the debug header asks for them.
+request_timings: contextvars.ContextVar[Optional[List[Dict[str, Any]]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+@contextmanager
+def labelled(route: str, source: str = "") -> Iterator[None]:
+    """Tags metrics recorded inside the block with a route and source, e.g. for background jobs."""
+    token = request_labels.set({"route": route, "source": source or ""})
+    try:
+        yield
+    finally:
+        request_labels.reset(token)
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    Times a pipeline stage, recording its duration, any error, and an entry in the request's timing breakdown.
+    """
+    labels = request_labels.get()
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = type(e).__name__
+        metrics.inc("assistant_stage_errors_total", stage=stage, **labels)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.observe("assistant_stage_duration_seconds", elapsed, stage=stage, **labels)
+        timings = request_timings.get()
+        if timings is not None:
+            entry = {"stage": stage, "seconds": round(elapsed, 4)}
+            if error:
+                entry["error"] = error
+            timings.append(entry)
+
+def timed(stage: str, runnable) -> RunnableLambda:
+    """Wraps a runnable (e.g. an output parser in a chain) in a span."""
+    def invoke(value: Any) -> Any:
+        with span(stage):
+            return runnable.invoke(value)
+    return RunnableLambda(invoke)
+
+def record_cache(cache: str, hit: bool, count: int = 1) -> None:
+    metrics.inc("assistant_cache_requests_total", count, cache=cache, result="hit" if hit else "miss")
+
+def record_tokens(model: str, prompt_tokens: int, completion_tokens: int) -> None:
+    labels = request_labels.get()
+    metrics.inc("assistant_llm_tokens_total", prompt_tokens, kind="prompt", model=model, **labels)
+    metrics.inc("assistant_llm_tokens_total", completion_tokens, kind="completion", model=model, **labels)
+    timings = request_timings.get()
+    if timings is not None:
+        timings.append({"stage": "llm_tokens", "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens})
+
+def summarize_timings(timings: List[Dict[str, Any]], total_seconds: float) -> Dict[str, Any]:
+    """Groups a request's timing entries by stage for the debug response."""
+    stages: Dict[str, Dict[str, Any]] = {}
+    prompt_tokens = completion_tokens = 0
+    for entry in list(timings):
+        if entry["stage"] == "llm_tokens":
+            prompt_tokens += entry["prompt_tokens"]
+            completion_tokens += entry["completion_tokens"]
+            continue
+        stage = stages.setdefault(entry["stage"], {"count": 0, "seconds": 0.0, "errors": 0})
+        stage["count"] += 1
+        stage["seconds"] = round(stage["seconds"] + entry["seconds"], 4)
+        stage["errors"] += 1 if entry.get("error") else 0
+    return {
+        "total_seconds": round(total_seconds, 4),
+        "stages": stages,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+    }
@@ -1,52 +1,163 @@
-import ocrspace
+import contextvars
+import hashlib
 import os
-from typing import List, Dict
-from config import OCR_SPACE_API_KEY
-
-print(OCR_SPACE_API_KEY, 'OCR')
-api = ocrspace.API(
-    api_key=OCR_SPACE_API_KEY,
-    OCREngine=2
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Optional
+from config import (
+    OCR_ENGINE, OCR_CONCURRENCY, OCR_TIMEOUT_SECONDS, OCR_MAX_RETRIES, OCR_RETRY_BASE_DELAY,
+    OCR_CACHE_MAX_MB
 )
+from services.cache import DiskCache
+from services.providers import create_ocr_api
+from services.metrics import metrics, span, record_cache
+from services.preprocess import preprocess_for_ocr
+
+_thread_local = threading.local()
+
+ocr_cache = DiskCache("data/cache/ocr.sqlite3", max_bytes=OCR_CACHE_MAX_MB * 1024 * 1024)
+
+def _get_api():
+    """
+    Returns the OCR.space client of the current thread so concurrent OCR calls never share a client.
+    """
+    api = getattr(_thread_local, "api", None)
+    if api is None:
+        api = create_ocr_api()
+        _thread_local.api = api
+    return api
 
-def ocr_file(file_path: str) -> str:
+def _ocr_file_with_retry(file_path: str, max_retries: int = OCR_MAX_RETRIES) -> str:
+    """
+    Sends an image file to the OCR.space API, retrying failed calls with exponential backoff.
+    Raises the last error once every attempt has failed.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            with span("ocr"):
+                result = _get_api().ocr_file(file_path)
+
+            if isinstance(result, dict) and 'ParsedResults' in result:
+                if result['ParsedResults'] and len(result['ParsedResults']) > 0:
+                    return result['ParsedResults'][0].get('ParsedText', '')
+            elif isinstance(result, str):
+                return result
+
+            return ""
+
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = OCR_RETRY_BASE_DELAY * (2 ** attempt)
+            print(f"OCR attempt {attempt + 1} failed for {os.path.basename(file_path)}, retrying in {delay}s: {e}")
+            time.sleep(delay)
+
+def ocr_cache_key(file_path: str) -> str:
+    """
+    Returns the OCR cache key of an image: a hash of its bytes and the OCR engine setting.
+    """
+    digest = hashlib.sha256(f"engine={OCR_ENGINE}\n".encode('utf-8'))
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _ocr_file_cached(file_path: str) -> str:
+    """
+    Returns the cached OCR text of an image with the same bytes, calling OCR.space only on a cache miss.
+    The cache is keyed by the original image, and a shrunken copy is what gets sent to OCR.
+    """
+    key = ocr_cache_key(file_path)
+    cached = ocr_cache.get(key)
+    record_cache("ocr", cached is not None)
+    if cached is not None:
+        print(f"OCR cache hit for: {os.path.basename(file_path)}")
+        return cached
+
+    with span("ocr_preprocess"):
+        ocr_path, info = preprocess_for_ocr(file_path)
+    try:
+        if ocr_path != file_path:
+            metrics.inc("assistant_ocr_preprocess_bytes_saved_total", info["bytes_saved"])
+            print(f"Pre-processed {os.path.basename(file_path)}: {info['original_bytes']} -> {info['processed_bytes']} bytes "
+                  f"({info['bytes_saved']} saved)")
+        elif info.get("error"):
+            print(f"Sending {os.path.basename(file_path)} without pre-processing: {info['error']}")
+        text = _ocr_file_with_retry(ocr_path)
+    finally:
+        if ocr_path != file_path:
+            os.remove(ocr_path)
+
+    ocr_cache.set(key, text)
+    return text
+
+def ocr_file(file_path: str, raise_errors: bool = False) -> str:
     """
     Performs pre-processing on an image file and sends it to the OCR.space API.
+    Errors yield an empty string unless `raise_errors` is set.
     """
-    
+    if raise_errors:
+        return _ocr_file_cached(file_path)
+
     try:
-        result = api.ocr_file(file_path)
-        
-        if isinstance(result, dict) and 'ParsedResults' in result:
-            if result['ParsedResults'] and len(result['ParsedResults']) > 0:
-                return result['ParsedResults'][0].get('ParsedText', '')
-        elif isinstance(result, str):
-            return result
-        
-        return ""
+        return _ocr_file_cached(file_path)
 
     except Exception as e:
         print(f"An error occurred: {e}")
         return ""
 
-def ocr_multiple_files(file_paths: List[str]) -> Dict[str, str]:
+def ocr_files_parallel(file_paths: List[str], max_workers: int = OCR_CONCURRENCY,
+                       timeout: float = OCR_TIMEOUT_SECONDS) -> List[Optional[str]]:
     """
-    Performs OCR on multiple files and returns a dictionary with filenames and their OCR results.
+    Performs OCR on files using a bounded thread pool. Results are returned in the order of `file_paths`;
+    files that fail or run longer than `timeout` seconds yield None.
     """
-    results = {}
-    
-    for file_path in file_paths:
-        try:
-            filename = os.path.basename(file_path)
-            ocr_result = ocr_file(file_path)
-            results[filename] = ocr_result
-            print(f"OCR completed for: {filename}")
-        except Exception as e:
-            print(f"Error processing {file_path}: {e}")
-            results[os.path.basename(file_path)] = ""
-    
+    if not file_paths:
+        return []
+
+    results: List[Optional[str]] = [None] * len(file_paths)
+    started: Dict[int, float] = {}
+
+    def run(i: int, file_path: str) -> str:
+        started[i] = time.monotonic()
+        return _ocr_file_cached(file_path)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(file_paths))))
+    try:
+        futures = {
+            executor.submit(contextvars.copy_context().run, run, i, file_path): i
+            for i, file_path in enumerate(file_paths)
+        }
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                    print(f"OCR completed for: {os.path.basename(file_paths[i])}")
+                except Exception as e:
+                    print(f"Error processing {file_paths[i]}: {e}")
+
+            now = time.monotonic()
+            for future in list(pending):
+                i = futures[future]
+                if i in started and now - started[i] > timeout:
+                    print(f"OCR timed out after {timeout}s for: {os.path.basename(file_paths[i])}")
+                    pending.discard(future)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
     return results
 
+def ocr_multiple_files(file_paths: List[str]) -> Dict[str, str]:
+    """
+    Performs OCR on multiple files in parallel and returns a dictionary with filenames and their OCR results.
+    """
+    ocr_results = ocr_files_parallel(file_paths)
+    return {os.path.basename(file_path): text or "" for file_path, text in zip(file_paths, ocr_results)}
+
 def combine_ocr_results(ocr_results: Dict[str, str]) -> str:
     """
     Combines OCR results from multiple files into a single text with file markers.
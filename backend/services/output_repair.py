@@ -0,0 +1,206 @@
+import json
+import re
+from typing import Any, Dict, List, Tuple, Type
+from langchain_core.exceptions import OutputParserException
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel, ValidationError
+from services.metrics import metrics
+
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.S | re.I)
+_VALID_ESCAPES = '"\\/bfnrtu'
+_CLOSERS = {'{': '}', '[': ']'}
+# LaTeX commands that json.loads would silently read as control-character escapes (\frac as form feed + "rac",
+# \theta as tab + "heta"). \b and \f are never meant literally before a letter; \n, \r and \t only for known
+# commands long enough not to be ordinary text after a newline or tab (so not \ne, \nu, \to, \tan or \rm).
+_LATEX_ESCAPE_RE = re.compile(
+    r'(?<!\\)((?:\\\\)*)\\([bf](?=[A-Za-z])|(?:theta|times|tau|text|tilde|triangle|neq|nabla|not|neg'
+    r'|newline|rho|rightarrow|right|rangle)(?![A-Za-z]))'
+)
+# Truncated output is cut back at most this many structural commas before giving up.
+MAX_CUT_ATTEMPTS = 200
+
+def protect_latex(text: str) -> str:
+    """
+    Doubles the backslash of LaTeX commands that are also valid JSON escapes. Only applied to output that
+    does not parse as it is, since a newline or tab before ordinary text can look the same.
+    """
+    return _LATEX_ESCAPE_RE.sub(r'\1\\\\\2', text)
+
+def _strip_wrapping(text: str) -> str:
+    """Drops code fences and any prose before the first JSON object or array."""
+    match = _FENCE_RE.search(text)
+    if match and match.group(1).strip():
+        text = match.group(1)
+    starts = [i for i in (text.find('{'), text.find('[')) if i >= 0]
+    return text[min(starts):].strip() if starts else text.strip()
+
+def _strip_trailing_comma(out: List[str]) -> None:
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ',':
+        out.pop()
+
+def _scan(text: str) -> Tuple[List[str], List[str], bool, List[Tuple[int, Tuple[str, ...]]]]:
+    """
+    Rewrites the first JSON value in `text` in one pass: escapes quotes inside strings that are not followed
+    by a structural character, raw newlines/tabs and invalid backslash escapes, drops trailing commas and
+    ignores anything after the top-level value. Returns the rewritten characters, the containers still open
+    at the end (for truncated output), whether a string is still open, and the positions of structural commas
+    with the containers open there, where a truncated tail can be cut off.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    cut_points: List[Tuple[int, Tuple[str, ...]]] = []
+    in_string = False
+    i, n = 0, len(text)
+    while i < n:
+        ch = text[i]
+        if in_string:
+            if ch == '\\':
+                if i + 1 < n and text[i + 1] in _VALID_ESCAPES:
+                    out.append(text[i:i + 2])
+                    i += 2
+                    continue
+                out.append('\\\\')
+            elif ch == '"':
+                j = i + 1
+                while j < n and text[j].isspace():
+                    j += 1
+                if j >= n or text[j] in ',:}]':
+                    in_string = False
+                    out.append(ch)
+                else:
+                    out.append('\\"')
+            elif ch == '\n':
+                out.append('\\n')
+            elif ch == '\r':
+                out.append('\\r')
+            elif ch == '\t':
+                out.append('\\t')
+            else:
+                out.append(ch)
+        elif ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in _CLOSERS:
+            stack.append(_CLOSERS[ch])
+            out.append(ch)
+        elif ch in '}]':
+            if stack:
+                _strip_trailing_comma(out)
+                out.append(stack.pop())
+                if not stack:
+                    break
+        elif ch == ',':
+            cut_points.append((len(out), tuple(stack)))
+            out.append(ch)
+        else:
+            out.append(ch)
+        i += 1
+    return out, stack, in_string, cut_points
+
+def repair_json(text: str) -> Any:
+    """
+    Parses JSON produced by an LLM, repairing the usual defects locally: code fences and surrounding prose,
+    trailing commas, unescaped quotes and newlines inside strings, invalid escapes and truncated output.
+    Truncated output keeps every element before the one that was cut off. Raises ValueError when nothing
+    can be recovered.
+    """
+    cleaned = _strip_wrapping(text)
+    try:
+        return json.loads(cleaned)
+    except ValueError:
+        pass
+
+    cleaned = protect_latex(cleaned)
+    try:
+        return json.loads(cleaned)
+    except ValueError:
+        pass
+
+    out, stack, _, cut_points = _scan(cleaned)
+    if not stack:
+        try:
+            return json.loads(''.join(out))
+        except ValueError:
+            pass
+
+    # Truncated (or still invalid) output: drop the tail after the last complete element and close what is open.
+    for position, open_containers in reversed(cut_points[-MAX_CUT_ATTEMPTS:]):
+        try:
+            return json.loads(''.join(out[:position]) + ''.join(reversed(open_containers)))
+        except ValueError:
+            continue
+    raise ValueError("No JSON could be recovered from the model output")
+
+def _validate_item(item_model: Type[BaseModel], item: Any) -> BaseModel:
+    try:
+        return item_model.model_validate(item)
+    except ValidationError:
+        if not isinstance(item, dict):
+            raise
+        # Models often emit numbers where the schema wants strings (e.g. question numbers).
+        coerced = {key: str(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else value
+                   for key, value in item.items()}
+        return item_model.model_validate(coerced)
+
+def salvage_items(text: str, list_field: str, item_model: Type[BaseModel]) -> Tuple[List[BaseModel], Dict[str, Any], Dict[str, Any]]:
+    """
+    Repairs the model output and validates the items of `list_field` one by one, keeping every item that
+    validates. Returns the valid items, the other top-level fields and a report of what was repaired or dropped.
+    Raises OutputParserException when the output holds no JSON at all.
+    """
+    report = {"repaired": False, "invalid_items": 0}
+    try:
+        data = json.loads(text)
+    except ValueError:
+        report["repaired"] = True
+        try:
+            data = repair_json(text)
+        except ValueError as e:
+            raise OutputParserException(str(e), llm_output=text)
+
+    if isinstance(data, list):
+        raw_items, fields = data, {}
+    elif isinstance(data, dict) and isinstance(data.get(list_field), list):
+        raw_items, fields = data[list_field], {key: value for key, value in data.items() if key != list_field}
+    elif isinstance(data, dict):
+        raw_items, fields = [data], {}
+    else:
+        raise OutputParserException(f"Expected a JSON object with '{list_field}'", llm_output=text)
+
+    items = []
+    for raw_item in raw_items:
+        try:
+            items.append(_validate_item(item_model, raw_item))
+        except ValidationError:
+            report["invalid_items"] += 1
+    return items, fields, report
+
+def salvage_parser(output_model: Type[BaseModel], list_field: str, item_model: Type[BaseModel],
+                   defaults: Dict[str, Any]) -> RunnableLambda:
+    """
+    Output parser for chains whose result is a list of items: repairs malformed JSON locally and keeps every
+    valid item instead of handing the whole output back to the LLM. Top-level fields that are missing or
+    invalid (e.g. in truncated output) fall back to `defaults`.
+    """
+    def parse(message: Any) -> BaseModel:
+        text = message.content if hasattr(message, "content") else str(message)
+        try:
+            items, fields, report = salvage_items(text, list_field, item_model)
+        except OutputParserException:
+            metrics.inc("assistant_output_parse_total", result="failed")
+            raise
+
+        if report["invalid_items"]:
+            print(f"Dropped {report['invalid_items']} invalid {item_model.__name__} items from the model output")
+        result = "partial" if report["invalid_items"] else "repaired" if report["repaired"] else "valid"
+        metrics.inc("assistant_output_parse_total", result=result)
+
+        values = {**defaults, **{key: value for key, value in fields.items() if key in output_model.model_fields}}
+        try:
+            return output_model(**{**values, list_field: items})
+        except ValidationError:
+            return output_model(**{**defaults, list_field: items})
+
+    return RunnableLambda(parse)
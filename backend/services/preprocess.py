@@ -0,0 +1,111 @@
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+from config import (
+    OCR_PREPROCESS, OCR_TARGET_DPI, OCR_JPEG_QUALITY, OCR_PREPROCESS_WORKERS, OCR_PREPROCESS_TIMEOUT_SECONDS
+)
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+    ImageOps = None
+
+# Longest side of a letter/A4 page in inches; photos rarely carry a usable DPI, so the target DPI is applied to it.
+PAGE_LONG_SIDE_INCHES = 11.7
+
+# Forking a threaded server can leave locks held in the child, so workers start from a clean interpreter.
+_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _encode_for_ocr(file_path: str, max_side: int, quality: int) -> Tuple[Optional[bytes], Dict[str, Any]]:
+    """
+    Decodes an image once, applies its EXIF orientation, downscales it to `max_side`, converts it to grayscale
+    and re-encodes it as JPEG. Runs in a worker process. Returns None instead of bytes when the image cannot
+    be decoded or re-encoding would not make it smaller.
+    """
+    original_bytes = os.path.getsize(file_path)
+    try:
+        with Image.open(file_path) as image:
+            image = ImageOps.exif_transpose(image)
+            original_size = image.size
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+            image = image.convert("L")
+            buffer = io.BytesIO()
+            image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    except Exception as e:
+        return None, {"original_bytes": original_bytes, "error": str(e)}
+
+    data = buffer.getvalue()
+    info = {
+        "original_bytes": original_bytes,
+        "processed_bytes": len(data),
+        "original_size": original_size,
+        "processed_size": image.size,
+    }
+    if len(data) >= original_bytes:
+        return None, info
+    return data, info
+
+def image_pool() -> ProcessPoolExecutor:
+    """The process pool shared by CPU-bound image work (OCR pre-processing, thumbnails)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=OCR_PREPROCESS_WORKERS, mp_context=multiprocessing.get_context(_START_METHOD)
+            )
+        return _pool
+
+def run_in_image_pool(fn: Callable[..., Any], *args: Any, timeout: float = OCR_PREPROCESS_TIMEOUT_SECONDS) -> Any:
+    """
+    Runs `fn` on the image pool and waits at most `timeout` seconds for it. Raises TimeoutError or
+    BrokenProcessPool; a broken pool (e.g. a worker killed by the OS) is replaced for the next call.
+    """
+    global _pool
+    pool = image_pool()
+    try:
+        future = pool.submit(fn, *args)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+    except BrokenProcessPool:
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+
+def preprocess_for_ocr(file_path: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Shrinks an image for OCR on the pre-processing process pool. Returns the path to send to OCR and a report
+    with the bytes saved; the path is a temporary file (to be removed by the caller) when it differs from
+    `file_path`. Falls back to the original image when pre-processing is disabled, Pillow is missing, the image
+    cannot be decoded or the pool is broken or does not answer within OCR_PREPROCESS_TIMEOUT_SECONDS.
+    """
+    if not OCR_PREPROCESS or Image is None:
+        return file_path, {"skipped": True}
+
+    max_side = int(OCR_TARGET_DPI * PAGE_LONG_SIDE_INCHES)
+    try:
+        data, info = run_in_image_pool(_encode_for_ocr, file_path, max_side, OCR_JPEG_QUALITY)
+    except (TimeoutError, BrokenProcessPool) as e:
+        print(f"Pre-processing {os.path.basename(file_path)} failed, sending the original image: {e!r}")
+        return file_path, {"skipped": True, "error": repr(e)}
+    if data is None:
+        return file_path, info
+
+    temp_fd, temp_path = tempfile.mkstemp(suffix=".jpg", prefix="ocr-")
+    with os.fdopen(temp_fd, 'wb') as f:
+        f.write(data)
+    info["bytes_saved"] = info["original_bytes"] - info["processed_bytes"]
+    return temp_path, info
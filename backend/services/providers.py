@@ -0,0 +1,42 @@
+import ocrspace
+from typing import Any, Callable, Dict, Optional
+from langchain_nvidia_ai_endpoints import ChatNVIDIA, NVIDIAEmbeddings
+from services.embedding_store import cached_embeddings, CachedEmbeddings
+from config import NVIDIA_API_KEY, OCR_SPACE_API_KEY, OCR_ENGINE, LLM_MAX_TOKENS
+
+LLM_MODEL = "meta/llama-4-maverick-17b-128e-instruct"
+
+_factories: Dict[str, Optional[Callable[[], Any]]] = {"llm": None, "embeddings": None, "ocr": None}
+
+def set_provider_factories(llm: Optional[Callable[[], Any]] = None, embeddings: Optional[Callable[[], Any]] = None,
+                           ocr: Optional[Callable[[], Any]] = None) -> None:
+    """
+    Replaces the LLM, embeddings and OCR clients created by the services, e.g. with the benchmark stand-ins.
+    Factories left as None fall back to the NVIDIA and OCR.space clients.
+    """
+    _factories.update({"llm": llm, "embeddings": embeddings, "ocr": ocr})
+
+def create_llm():
+    """Returns the chat model used for question detection and answering."""
+    if _factories["llm"] is not None:
+        return _factories["llm"]()
+    return ChatNVIDIA(
+        model=LLM_MODEL,
+        api_key=NVIDIA_API_KEY,
+        max_tokens=LLM_MAX_TOKENS,
+    )
+
+def create_embeddings() -> CachedEmbeddings:
+    """Returns the embeddings client for source chunks and queries, backed by the shared embedding store."""
+    if _factories["embeddings"] is not None:
+        return cached_embeddings(_factories["embeddings"]())
+    return cached_embeddings(NVIDIAEmbeddings())
+
+def create_ocr_api():
+    """Returns an OCR client with an `ocr_file(path)` method."""
+    if _factories["ocr"] is not None:
+        return _factories["ocr"]()
+    return ocrspace.API(
+        api_key=OCR_SPACE_API_KEY,
+        OCREngine=OCR_ENGINE
+    )
@@ -0,0 +1,156 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from services.segments import FILE_MARKER_PATTERN, SECTION_HEADER_PATTERN
+
+CONTINUING_SECTION_PATTERN = re.compile(r'^\(Continuing section: (.*)\)$')
+END_MARKER_PATTERN = re.compile(r'^--- END OF .* ---$')
+# A number starts a question only with a delimiter ("3.", "3)", "3:") or a Q/Question prefix; "3 students..." is prose.
+NUMBERED_PATTERN = re.compile(r'^\s*((?:Q(?:uestion)?\.?\s*\d+\s*[.):]?)|(?:\d+\s*[.):]))\s+(\S.*)$', re.IGNORECASE)
+BARE_NUMBERED_PATTERN = re.compile(r'^\s*\d+\s+\S')
+LETTERED_PATTERN = re.compile(r'^\s*(\(?([a-hA-H])[.)])\s+(\S.*)$')
+ROMAN_PATTERN = re.compile(r'^\s*(\(?(ii|iii|iv|v|vi|vii|viii|ix|x|i)[.)])\s+(\S.*)$')
+INLINE_OPTIONS_PATTERN = re.compile(r'(?:^|\s)\(?([A-Da-d])[.)]\s+')
+MCQ_HINT_PATTERN = re.compile(r'(multiple choice|mcq|choose|select|which of the following|_{3,}|\?\s*$)', re.IGNORECASE)
+
+def _split_inline_options(text: str) -> Tuple[str, Optional[List[str]]]:
+    """
+    Splits 'stem A) one B) two C) three' into the stem and its options when the letters run in order from A.
+    """
+    matches = list(INLINE_OPTIONS_PATTERN.finditer(text))
+    letters = [match.group(1).lower() for match in matches]
+    if len(matches) < 2 or letters != [chr(ord('a') + i) for i in range(len(letters))]:
+        return text, None
+    stem = text[:matches[0].start()].strip()
+    options = []
+    for match, next_match in zip(matches, matches[1:] + [None]):
+        end = next_match.start() if next_match else len(text)
+        options.append(f"{match.group(1)}) {text[match.end():end].strip()}")
+    return stem, options
+
+def _option_shaped(items: List[Tuple[str, str, str]]) -> bool:
+    """Whether lettered items run a), b), c)... with short texts, as MCQ options do."""
+    letters = [letter.lower() for _, letter, _ in items]
+    if not 2 <= len(items) <= 6 or letters != [chr(ord('a') + i) for i in range(len(items))]:
+        return False
+    return all(len(text) <= 120 for _, _, text in items)
+
+def _reads_as_subquestions(items: List[Tuple[str, str, str]]) -> bool:
+    return any(len(text.split()) >= 3 and text.rstrip().endswith(('?', '.')) for _, _, text in items)
+
+def _has_mcq_hint(question: Dict[str, Any]) -> bool:
+    return bool(MCQ_HINT_PATTERN.search(question["question"]) or MCQ_HINT_PATTERN.search(question["section"]))
+
+def _looks_like_options(question: Dict[str, Any], items: List[Tuple[str, str, str]]) -> bool:
+    return _option_shaped(items) and _has_mcq_hint(question)
+
+def parse_questions(content: str) -> Tuple[List[Dict[str, Any]], float]:
+    """
+    Extracts numbered questions, section headers and MCQ options from plainly formatted text without an LLM.
+    Returns the questions as `Question` fields and a confidence between 0 and 1 that the parse is complete.
+    """
+    questions: List[Dict[str, Any]] = []
+    section = "Uncategorized"
+    current: Optional[Dict[str, Any]] = None
+    pending_items: List[Tuple[str, str, str]] = []
+    unparsed_lines = 0
+    bare_numbered_lines = 0
+    ambiguous_items = 0
+
+    def flush_items():
+        nonlocal pending_items, ambiguous_items
+        if current is None or not pending_items:
+            pending_items = []
+            return
+        if _looks_like_options(current, pending_items):
+            current["options"] = [f"{letter}) {text}" for _, letter, text in pending_items]
+        else:
+            if _option_shaped(pending_items) and not _reads_as_subquestions(pending_items):
+                # Could be options of a question without an MCQ cue as well as sub-questions.
+                ambiguous_items += len(pending_items)
+            for number, _, text in pending_items:
+                questions.append({"question": text, "question_number": number, "section": current["section"], "options": None})
+        pending_items = []
+
+    for raw_line in content.splitlines():
+        line = raw_line.strip()
+        if not line or FILE_MARKER_PATTERN.match(line) or END_MARKER_PATTERN.match(line):
+            continue
+
+        continuing = CONTINUING_SECTION_PATTERN.match(line)
+        if continuing:
+            section = continuing.group(1).strip()
+            continue
+
+        if SECTION_HEADER_PATTERN.match(line):
+            flush_items()
+            current = None
+            section = line
+            continue
+
+        numbered = NUMBERED_PATTERN.match(line)
+        if numbered:
+            flush_items()
+            stem, options = _split_inline_options(numbered.group(2).strip())
+            current = {"question": stem, "question_number": numbered.group(1).strip(), "section": section, "options": options}
+            questions.append(current)
+            continue
+
+        if BARE_NUMBERED_PATTERN.match(line):
+            # Either prose starting with a number or questions numbered without a delimiter; leave it to the LLM.
+            bare_numbered_lines += 1
+
+        lettered = LETTERED_PATTERN.match(line) or ROMAN_PATTERN.match(line)
+        if lettered and current is not None:
+            stem, options = _split_inline_options(line)
+            if options and not stem:
+                # A row of options ("A) iron B) oxygen C) salt") belongs to the question above it.
+                short_options = all(len(option) <= 60 for option in options)
+                if pending_items or current["options"] or not (_has_mcq_hint(current) or short_options):
+                    ambiguous_items += 1
+                else:
+                    current["options"] = options
+                    continue
+            pending_items.append((lettered.group(1).strip(), lettered.group(2), lettered.group(3).strip()))
+            continue
+
+        if pending_items:
+            number, letter, text = pending_items[-1]
+            pending_items[-1] = (number, letter, f"{text} {line}")
+        elif current is not None:
+            stem, options = _split_inline_options(line)
+            if options and not current["options"]:
+                current["options"] = options
+                if stem:
+                    current["question"] = f"{current['question']} {stem}"
+            else:
+                current["question"] = f"{current['question']} {line}"
+        else:
+            unparsed_lines += 1
+    flush_items()
+
+    return questions, _confidence(questions, unparsed_lines, bare_numbered_lines, ambiguous_items)
+
+def _confidence(questions: List[Dict[str, Any]], unparsed_lines: int, bare_numbered_lines: int = 0,
+                ambiguous_items: int = 0) -> float:
+    """
+    Scores a parse by how consistent its numbering and question texts are.
+    """
+    if not questions:
+        return 0.0
+
+    numbers = []
+    for q in questions:
+        digits = re.search(r'\d+', q["question_number"])
+        if digits:
+            numbers.append(int(digits.group()))
+    if not numbers:
+        return 0.0
+
+    in_sequence = sum(1 for previous, number in zip(numbers, numbers[1:]) if number == previous + 1 or number == 1)
+    sequence_score = (in_sequence + 1) / len(numbers)
+    sane_texts = sum(1 for q in questions if 8 <= len(q["question"]) <= 600)
+    text_score = sane_texts / len(questions)
+    preamble_penalty = 0.9 if unparsed_lines > 5 else 1.0
+    bare_number_penalty = 0.5 if bare_numbered_lines else 1.0
+    ambiguity_penalty = 0.7 if ambiguous_items else 1.0
+    return round(sequence_score * text_score * preamble_penalty * bare_number_penalty * ambiguity_penalty, 3)
@@ -0,0 +1,112 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from services.assistant import HomeworkAnswerAssistant
+from services.manifest import get_manifest
+from config import ASSISTANT_CACHE_MAX_INSTANCES, ASSISTANT_CACHE_MAX_MB
+
+def estimate_assistant_bytes(assistant: HomeworkAnswerAssistant) -> int:
+    """
+    Approximates the resident size of an assistant from its source texts and vectorstore.
+    """
+    size = sum(len(text) for text in assistant.source_texts)
+    vectorstore = assistant.vectorstore
+    if vectorstore is not None:
+        size += vectorstore.index.ntotal * vectorstore.index.d * 4
+        docs = getattr(vectorstore.docstore, "_dict", {})
+        size += sum(len(doc.page_content) for doc in docs.values())
+    return size
+
+def source_state(source_name: str) -> Optional[Dict[str, str]]:
+    """
+    The images of a source with their content hashes, from its manifest. Every worker process that uploads or
+    deletes files refreshes the manifest, so a change here means a cached assistant is stale. None when the
+    source does not exist.
+    """
+    manifest = get_manifest(source_name)
+    return {file: entry["sha256"] for file, entry in manifest["files"].items()} if manifest else None
+
+class AssistantRegistry:
+    """
+    Process-wide LRU cache of warm assistants, one per source, capped by instance count and approximate bytes.
+    Each assistant is kept with the source state it was built from and rebuilt once the source changes, also
+    when the change was made by another worker process.
+    """
+    def __init__(self, max_instances: int, max_bytes: int):
+        self.max_instances = max_instances
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[HomeworkAnswerAssistant, int, Optional[Dict[str, str]]]]" = OrderedDict()
+        self._total_bytes = 0
+        # Per-source build state, kept only while a build is in flight so sources that come and go do not leak.
+        self._generations: Dict[str, int] = {}
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._builders: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, source_name: str) -> HomeworkAnswerAssistant:
+        """Returns the warm assistant for a source, building it if needed or if the source changed since."""
+        state = source_state(source_name)
+        with self._lock:
+            entry = self._entries.get(source_name)
+            if entry and entry[2] == state:
+                self._entries.move_to_end(source_name)
+                return entry[0]
+            build_lock = self._build_locks.setdefault(source_name, threading.Lock())
+            self._builders[source_name] = self._builders.get(source_name, 0) + 1
+
+        try:
+            with build_lock:
+                # Read before building, so a change made while the assistant is built triggers another rebuild.
+                state = source_state(source_name)
+                with self._lock:
+                    entry = self._entries.get(source_name)
+                    if entry and entry[2] == state:
+                        self._entries.move_to_end(source_name)
+                        return entry[0]
+                    if entry:
+                        print(f"Source {source_name} changed; rebuilding its assistant")
+                    generation = self._generations.get(source_name, 0)
+
+                assistant = HomeworkAnswerAssistant(source_name=source_name)
+                size = estimate_assistant_bytes(assistant)
+
+                with self._lock:
+                    if self._generations.get(source_name, 0) == generation:
+                        self._drop(source_name)
+                        self._entries[source_name] = (assistant, size, state)
+                        self._total_bytes += size
+                        self._evict()
+                return assistant
+        finally:
+            with self._lock:
+                self._builders[source_name] -= 1
+                if not self._builders[source_name]:
+                    del self._builders[source_name]
+                    self._build_locks.pop(source_name, None)
+                    self._generations.pop(source_name, None)
+
+    def invalidate(self, source_name: str) -> None:
+        """Drops the cached assistant for a source so the next request rebuilds it."""
+        with self._lock:
+            if source_name in self._builders:
+                self._generations[source_name] = self._generations.get(source_name, 0) + 1
+            self._drop(source_name)
+
+    def _drop(self, source_name: str) -> None:
+        entry = self._entries.pop(source_name, None)
+        if entry:
+            self._total_bytes -= entry[1]
+
+    def _evict(self) -> None:
+        while self._entries and (
+            len(self._entries) > self.max_instances
+            or (self._total_bytes > self.max_bytes and len(self._entries) > 1)
+        ):
+            evicted_name, (_, size, _) = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            print(f"Evicted assistant for source: {evicted_name}")
+
+assistant_registry = AssistantRegistry(
+    max_instances=ASSISTANT_CACHE_MAX_INSTANCES,
+    max_bytes=ASSISTANT_CACHE_MAX_MB * 1024 * 1024
+)
@@ -0,0 +1,84 @@
+import re
+from typing import List
+
+FILE_MARKER_PATTERN = re.compile(r'^--- FILE: .* ---$', re.MULTILINE)
+SECTION_HEADER_PATTERN = re.compile(r'^\s*(section|part|unit|chapter)\b.*$', re.IGNORECASE)
+QUESTION_START_PATTERN = re.compile(r'^\s*(Q\.?\s*\d+|\d+\s*[.)]|\(?[a-z]\)|\(?[ivx]+\)|[ivx]+\.)\s+', re.IGNORECASE)
+
+def _split_on_boundaries(text: str, max_chars: int) -> List[str]:
+    """
+    Splits text into pieces of roughly `max_chars`, cutting only before section headers or question numbers
+    unless a piece grows to twice the limit.
+    """
+    pieces = []
+    current_lines = []
+    current_length = 0
+    for line in text.splitlines():
+        is_boundary = bool(SECTION_HEADER_PATTERN.match(line) or QUESTION_START_PATTERN.match(line))
+        if current_lines and (
+            (current_length >= max_chars and is_boundary) or current_length >= 2 * max_chars
+        ):
+            pieces.append("\n".join(current_lines))
+            current_lines = []
+            current_length = 0
+        current_lines.append(line)
+        current_length += len(line) + 1
+    if current_lines:
+        pieces.append("\n".join(current_lines))
+    return pieces
+
+def _last_section_header(text: str) -> str:
+    headers = [line.strip() for line in text.splitlines() if SECTION_HEADER_PATTERN.match(line)]
+    return headers[-1] if headers else ""
+
+def _first_content_line(text: str) -> str:
+    for line in text.splitlines():
+        if line.strip() and not FILE_MARKER_PATTERN.match(line.strip()):
+            return line
+    return ""
+
+def _has_questions(text: str) -> bool:
+    return any(QUESTION_START_PATTERN.match(line) for line in text.splitlines())
+
+def split_content_segments(content: str, max_chars: int = 6000) -> List[str]:
+    """
+    Splits detection content into independent segments: one per `--- FILE: ... ---` block from
+    combine_ocr_results, further split on section or question boundaries when a block is too long.
+    Segments that continue a section, also across file blocks, are prefixed with that section's header so
+    questions keep their section. Segments without any question (e.g. a preamble) are merged into the next one.
+    """
+    content = content.strip()
+    if not content:
+        return []
+
+    starts = [match.start() for match in FILE_MARKER_PATTERN.finditer(content)]
+    if not starts or starts[0] != 0:
+        starts = [0] + starts
+    blocks = [content[start:end].strip() for start, end in zip(starts, starts[1:] + [len(content)])]
+
+    pieces = []
+    section_header = ""
+    for block in blocks:
+        if not block:
+            continue
+        for piece in _split_on_boundaries(block, max_chars):
+            if section_header and not SECTION_HEADER_PATTERN.match(_first_content_line(piece)):
+                pieces.append(f"(Continuing section: {section_header})\n{piece}")
+            else:
+                pieces.append(piece)
+            section_header = _last_section_header(piece) or section_header
+
+    segments = []
+    carried = ""
+    for piece in pieces:
+        if not _has_questions(piece):
+            carried = f"{carried}\n{piece}" if carried else piece
+            continue
+        segments.append(f"{carried}\n{piece}" if carried else piece)
+        carried = ""
+    if carried:
+        if segments:
+            segments[-1] = f"{segments[-1]}\n{carried}"
+        else:
+            segments.append(carried)
+    return segments
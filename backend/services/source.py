@@ -1,37 +1,105 @@
-from typing import List
+from typing import Dict, List
 from pathlib import Path
 import os
-from services.ocr import ocr_file
+from services.ocr import ocr_file, ocr_files_parallel
+from services.index import update_index
+from services.providers import create_embeddings
+from services.metrics import span
 
-def read_sources(source_name: str) -> List[str]:
+ALLOWED_FILE_EXT = ["png", "jpg", "jpeg"]
+
+def list_source_pages(source_name: str) -> List[str]:
     """
-    Reads the content of all source files in the specified folder.
+    Lists the image files of a source.
+    """
+    source_dir_path = Path(f"uploads/sources/{source_name}")
+    return [file for file in os.listdir(source_dir_path) if file.lower().split('.')[-1] in ALLOWED_FILE_EXT]
+
+def _text_file_path(source_name: str, file: str) -> Path:
+    file_name = '.'.join(file.lower().split('.')[:-1])
+    return Path(f"uploads/sources/{source_name}") / f"{file_name}.txt"
+
+def read_source_page(source_name: str, file: str, refresh: bool = False, raise_errors: bool = False) -> str:
+    """
+    Reads the OCR text of a single source image, running OCR and caching it next to the image if needed.
+    With `raise_errors`, a failed OCR call raises instead of caching empty text.
+    """
+    text_file_path = _text_file_path(source_name, file)
+    if text_file_path.exists() and not refresh:
+        with open(text_file_path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    ocr_result = ocr_file(str(Path(f"uploads/sources/{source_name}") / file), raise_errors=raise_errors)
+    with open(text_file_path, 'w', encoding='utf-8') as f:
+        f.write(ocr_result)
+    return ocr_result
+
+def read_source_pages(source_name: str) -> Dict[str, str]:
+    """
+    Reads the content of all source files in the specified folder, keyed by image file name.
     """
     try:
-        sources = []
-        source_dir_path = Path(f"uploads/sources/{source_name}")
-        files = os.listdir(source_dir_path)
-        allowed_file_ext = ["png", "jpg", "jpeg"]
-
-        for file in files:
-            file_ext = file.lower().split('.')[-1]
-            file_name = '.'.join(file.lower().split('.')[:-1])
-            text_file_path = source_dir_path / f"{file_name}.txt"
-            if file_ext == "txt": continue
-            if text_file_path.exists():
-                with open(text_file_path, 'r', encoding='utf-8') as f:
-                    sources.append(f.read())
-            else:
-                if file_ext in allowed_file_ext:
-                    file_path = source_dir_path / file
-                    ocr_result = ocr_file(str(file_path))
-                    with open(text_file_path, 'w', encoding='utf-8') as f:
+        with span("source_load"):
+            files = sorted(list_source_pages(source_name))
+            uncached = [file for file in files if not _text_file_path(source_name, file).exists()]
+            failed = set()
+            if uncached:
+                source_dir_path = Path(f"uploads/sources/{source_name}")
+                ocr_results = ocr_files_parallel([str(source_dir_path / file) for file in uncached])
+                for file, ocr_result in zip(uncached, ocr_results):
+                    if ocr_result is None:
+                        failed.add(file)
+                        continue
+                    with open(_text_file_path(source_name, file), 'w', encoding='utf-8') as f:
                         f.write(ocr_result)
-                    sources.append(ocr_result)
-        return sources
+            return {file: read_source_page(source_name, file) for file in files if file not in failed}
     except FileNotFoundError:
         print(f"File {source_name} not found.")
-        return []
+        return {}
     except Exception as e:
         print(f"An error occurred while reading the file: {e}")
-        return []
\ No newline at end of file
+        return {}
+
+def read_sources(source_name: str) -> List[str]:
+    """
+    Reads the content of all source files in the specified folder.
+    """
+    return list(read_source_pages(source_name).values())
+
+def store_uploaded_file(source_name: str, temp_path: str, file: str) -> None:
+    """
+    Moves an upload that was streamed to a temporary file into the source, dropping OCR text cached for an
+    earlier image of the same name.
+    """
+    os.replace(temp_path, Path(f"uploads/sources/{source_name}") / file)
+    text_file_path = _text_file_path(source_name, file)
+    if text_file_path.exists():
+        os.remove(text_file_path)
+
+def ingest_source_file(source_name: str, file: str) -> bool:
+    """
+    OCRs a newly uploaded image and appends only its chunks to the persisted index of the source.
+    Raises when OCR fails, so no empty text is cached for the image and it is OCRed again on the next load.
+    """
+    text_file_path = _text_file_path(source_name, file)
+    if text_file_path.exists():
+        # Text of an earlier image with the same name.
+        os.remove(text_file_path)
+    text = read_source_page(source_name, file, raise_errors=True)
+    return update_index(source_name, create_embeddings(), list_source_pages(source_name), added={file: text})
+
+def remove_source_files(source_name: str, files: List[str]) -> bool:
+    """
+    Deletes images and their cached OCR text from a source and removes their chunks from the persisted index.
+    """
+    source_dir_path = Path(f"uploads/sources/{source_name}")
+    removed = []
+    for file in files:
+        file_path = source_dir_path / file
+        if file_path.exists():
+            os.remove(file_path)
+            removed.append(file)
+        text_file_path = _text_file_path(source_name, file)
+        if file.lower().split('.')[-1] in ALLOWED_FILE_EXT and text_file_path.exists():
+            os.remove(text_file_path)
+    return update_index(source_name, create_embeddings(), list_source_pages(source_name), removed=removed)
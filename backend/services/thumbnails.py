@@ -0,0 +1,85 @@
+import os
+import tempfile
+from concurrent.futures import TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+from config import THUMBNAIL_SIZES, THUMBNAIL_QUALITY
+from services.preprocess import Image, ImageOps, run_in_image_pool
+from services.manifest import SOURCES_DIR, get_manifest, refresh_manifest
+from services.metrics import span
+
+THUMBNAILS_DIR = Path("data/thumbnails")
+
+def _render_thumbnail(file_path: str, target_path: str, size: int, quality: int) -> Optional[str]:
+    """
+    Decodes an image, applies its EXIF orientation, fits it into a `size` square and writes it as JPEG to
+    `target_path` through a temporary file. Runs in a worker process. Returns an error message on failure.
+    """
+    try:
+        with Image.open(file_path) as image:
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((size, size), Image.LANCZOS)
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target_path), suffix=".tmp")
+            with os.fdopen(temp_fd, 'wb') as f:
+                image.save(f, format="JPEG", quality=quality, optimize=True)
+        os.replace(temp_path, target_path)
+    except Exception as e:
+        return str(e)
+    return None
+
+def thumbnail_size(requested: int) -> int:
+    """Snaps a requested size to the smallest configured thumbnail size that covers it."""
+    sizes = sorted(THUMBNAIL_SIZES)
+    for size in sizes:
+        if size >= requested:
+            return size
+    return sizes[-1]
+
+def source_file_hash(source_name: str, file: str) -> Optional[str]:
+    """
+    Returns the content hash of a source image from its manifest, refreshing the manifest when the file changed
+    since it was written. None when the image does not exist.
+    """
+    try:
+        stat = (Path(SOURCES_DIR) / source_name / file).stat()
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    manifest = get_manifest(source_name)
+    entry = manifest["files"].get(file) if manifest else None
+    if not entry or entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime_ns:
+        manifest = refresh_manifest(source_name)
+        entry = manifest["files"].get(file) if manifest else None
+    return entry["sha256"] if entry else None
+
+def get_thumbnail(source_name: str, file: str, size: int) -> Optional[Tuple[Path, str]]:
+    """
+    Returns the path and content hash of a thumbnail, rendering it on the image pool on first use.
+    Thumbnails are stored by content hash, so re-uploading an image under the same name never serves a stale
+    preview and identical images share one file. None when the image is missing or cannot be rendered.
+    """
+    sha256 = source_file_hash(source_name, file)
+    if sha256 is None or Image is None:
+        return None
+
+    target_path = THUMBNAILS_DIR / str(size) / sha256[:2] / f"{sha256}.jpg"
+    if not target_path.exists():
+        target_path.parent.mkdir(parents=True, exist_ok=True)
+        source_path = Path(SOURCES_DIR) / source_name / file
+        with span("thumbnail"):
+            try:
+                error = run_in_image_pool(_render_thumbnail, str(source_path), str(target_path), size, THUMBNAIL_QUALITY)
+            except (TimeoutError, BrokenProcessPool) as e:
+                error = repr(e)
+        if error:
+            print(f"Failed to render a {size}px thumbnail of {file} in {source_name}: {error}")
+            return None
+    return target_path, sha256
+
+def generate_thumbnails(source_name: str, files: Iterable[str]) -> None:
+    """Renders every configured thumbnail size of freshly uploaded images ahead of the first preview request."""
+    for file in files:
+        for size in THUMBNAIL_SIZES:
+            get_thumbnail(source_name, file, size)
@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from services.source import read_source_pages
+from services.index import source_fingerprint, source_lock, index_exists, build_index, save_index
+from services.providers import create_embeddings
+from services.manifest import refresh_manifest
+from services.metrics import labelled
+from config import WARMUP_ON_START, WARMUP_CONCURRENCY
+
+def warm_index(source_name: str) -> Tuple[int, bool]:
+    """
+    Makes sure the OCR text and the persisted index of a source exist on disk, building and saving the index
+    only when none matches the current files. Nothing is kept in memory, so warming a large catalog does not
+    churn the assistant registry. Returns the number of pages and whether the source has an index.
+    """
+    with source_lock(source_name):
+        pages = read_source_pages(source_name)
+        if not pages:
+            return 0, False
+
+        embeddings = create_embeddings()
+        embedding_model = getattr(embeddings, "model", "") or ""
+        fingerprint = source_fingerprint(source_name, embedding_model)
+        if index_exists(source_name, fingerprint):
+            return len(pages), True
+
+        vectorstore = build_index(pages, embeddings)
+        if vectorstore is None:
+            return len(pages), False
+        save_index(source_name, fingerprint, vectorstore, list(pages), embedding_model)
+        refresh_manifest(source_name)
+        return len(pages), True
+
+class SourceWarmer:
+    """
+    Walks every source in the background so OCR text and indexes exist on disk before the first request,
+    and tracks per-source readiness for the health endpoint. Assistants are not built here; the first
+    request for a source loads its persisted index.
+    """
+    def __init__(self, enabled: bool, max_workers: int):
+        self.enabled = enabled
+        self.max_workers = max_workers
+        self.sources: Dict[str, Dict[str, Any]] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def start(self, source_names: Optional[List[str]] = None) -> None:
+        """Starts warming the given sources (every source folder by default) on a background thread."""
+        if source_names is None:
+            source_dir = "uploads/sources"
+            source_names = sorted(
+                name for name in os.listdir(source_dir)
+                if not name.startswith('.') and os.path.isdir(os.path.join(source_dir, name))
+            ) if os.path.isdir(source_dir) else []
+
+        with self._lock:
+            self.started_at = time.time()
+            self.finished_at = None
+            self.sources = {name: {"status": "pending"} for name in source_names}
+        print(f"Warming up {len(source_names)} sources")
+        threading.Thread(target=self._run, args=(source_names,), name="warmup", daemon=True).start()
+
+    def _run(self, source_names: List[str]) -> None:
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers), thread_name_prefix="warmup") as executor:
+            list(executor.map(self._warm_source, source_names))
+        with self._lock:
+            self.finished_at = time.time()
+        print(f"Warm-up finished in {self.finished_at - self.started_at:.1f}s")
+
+    def _warm_source(self, source_name: str) -> None:
+        started = time.time()
+        self._set(source_name, status="warming", started_at=started)
+        try:
+            with labelled("warmup", source_name):
+                pages, indexed = warm_index(source_name)
+            self._set(
+                source_name,
+                status="ready" if indexed else "empty",
+                pages=pages,
+                seconds=round(time.time() - started, 3)
+            )
+        except Exception as e:
+            print(f"Warm-up failed for {source_name}: {e}")
+            self._set(source_name, status="failed", error=str(e), seconds=round(time.time() - started, 3))
+
+    def _set(self, source_name: str, **fields) -> None:
+        with self._lock:
+            self.sources.setdefault(source_name, {}).update(fields)
+
+    def readiness(self) -> Dict[str, Any]:
+        """
+        Reports whether this worker is ready for traffic. With warm-up enabled the worker becomes ready once
+        every source has been attempted; sources that failed are reported but do not hold readiness back.
+        """
+        with self._lock:
+            sources = {name: dict(state) for name, state in self.sources.items()}
+            if not self.enabled:
+                ready = True
+            else:
+                ready = self.started_at is not None and all(
+                    state["status"] in ("ready", "empty", "failed") for state in sources.values()
+                )
+            return {
+                "ready": ready,
+                "warmup_enabled": self.enabled,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "sources": sources,
+            }
+
+source_warmer = SourceWarmer(enabled=WARMUP_ON_START, max_workers=WARMUP_CONCURRENCY)
@@ -14,8 +14,8 @@ import {
 } from 'react-icons/fi';
 import ReactMarkdown from 'react-markdown';
 import remarkGfm from 'remark-gfm';
-import { askAssistant, getChatHistory, clearChatHistory } from '@/services/assistant';
-import { AssistantResponse, AssistantQuestion } from '@/types/assistant';
+import { askAssistantStream, getChatHistory, clearChatHistory } from '@/services/assistant';
+import { AssistantBatch, AssistantQuestion } from '@/types/assistant';
 import StructuredAnswers from '@/components/ui/structured-answers';
 import jsPDF from 'jspdf';
 import Preloader from '../ui/preloader';
@@ -41,6 +41,7 @@ export default function QuestionChat({ sourceName }: QuestionChatProps) {
   const [stagedFiles, setStagedFiles] = useState<File[]>([]);
   const [stagedPreviews, setStagedPreviews] = useState<string[]>([]);
   const [isLoading, setIsLoading] = useState<boolean>(false);
+  const [progressText, setProgressText] = useState<string>('');
   const [chatHistory, setChatHistory] = useState<any[]>([]);
 
   const fileInputRef = useRef<HTMLInputElement>(null);
@@ -135,26 +136,58 @@ export default function QuestionChat({ sourceName }: QuestionChatProps) {
     setIsLoading(true);
 
     try {
-      const response: AssistantResponse = await askAssistant(sourceName, input, currentFiles);
-
-      let assistantMessage: Message = {
+      const assistantMessage: Message = {
         role: 'assistant',
         content: '',
         images: [],
         timestamp: new Date(),
       };
+      const batches: AssistantBatch[] = [];
+      let totalQuestions = 0;
+      let messageAdded = false;
+
+      const showAssistantMessage = (update: Partial<Message>) => {
+        Object.assign(assistantMessage, update);
+        const snapshot = { ...assistantMessage };
+        const isFirstUpdate = !messageAdded;
+        messageAdded = true;
+        setMessages(prev => {
+          const current = prev || [];
+          return isFirstUpdate ? [...current, snapshot] : [...current.slice(0, -1), snapshot];
+        });
+      };
 
-      if (response.result) {
-        if (response.result.type === 'structured_answers') {
-          assistantMessage.content = `Answered ${response.result.total_questions} questions`;
-          assistantMessage.answers = response.result.answers as AssistantQuestion[];
-          assistantMessage.isStructured = true;
-        } else {
-          assistantMessage.content = response.result.response || 'No response';
+      await askAssistantStream(sourceName, input, currentFiles, ({ event, data }) => {
+        if (event === 'status') {
+          setProgressText(data.message);
+        } else if (event === 'questions_detected') {
+          totalQuestions = data.total_questions;
+          setProgressText(`Detected ${data.total_questions} questions`);
+        } else if (event === 'progress') {
+          setProgressText(`Answered ${data.answered_questions} of ${data.total_questions} questions`);
+        } else if (event === 'batch') {
+          batches.push(data);
+          const answers = [...batches]
+            .sort((a, b) => Math.min(...a.question_indices) - Math.min(...b.question_indices))
+            .flatMap(batch => batch.answers);
+          showAssistantMessage({
+            content: `Answered ${answers.length} of ${totalQuestions} questions`,
+            answers,
+            isStructured: true,
+          });
+        } else if (event === 'done' && data.result) {
+          if (data.result.type === 'structured_answers') {
+            showAssistantMessage({
+              content: `Answered ${data.result.total_questions} questions`,
+              answers: data.result.answers as AssistantQuestion[],
+              isStructured: true,
+            });
+          } else {
+            showAssistantMessage({ content: data.result.response || 'No response' });
+          }
         }
-      }
+      });
 
-      setMessages(prev => prev ? [...prev, assistantMessage] : [assistantMessage]);
       await loadChatHistory();
     } catch (error) {
       const errorMessage: Message = {
@@ -166,6 +199,7 @@ export default function QuestionChat({ sourceName }: QuestionChatProps) {
       setMessages(prev => prev ? [...prev, errorMessage] : [errorMessage]);
     } finally {
       setIsLoading(false);
+      setProgressText('');
     }
   };
 
@@ -531,7 +565,7 @@ export default function QuestionChat({ sourceName }: QuestionChatProps) {
               <div className="bg-message-assistant border border-default-200 rounded-2xl p-4 shadow-sm">
                 <div className="flex items-center gap-3">
                   <FiLoader className="animate-spin text-primary-600" size={20} />
-                  <span className="text-default-600">Thinking...</span>
+                  <span className="text-default-600">{progressText || 'Thinking...'}</span>
                 </div>
               </div>
             </div>
@@ -21,6 +21,8 @@ interface SidebarProps {
   onToggle?: () => void;
 }
 
+const imageCount = (source: Source) => source.image_count ?? source.images.length;
+
 export default function Sidebar({
   sources,
   activeTab,
@@ -141,9 +143,9 @@ export default function Sidebar({
                     <div className="flex items-center justify-center h-8 w-8 bg-primary-200 rounded-full">
                       <FiFile className="w-4 h-4 text-primary-600" />
                     </div>
-                    {source.images.length > 0 && (
+                    {imageCount(source) > 0 && (
                       <div className="absolute -top-1 -right-1 h-4 w-4 bg-success-500 text-white rounded-full flex items-center justify-center text-xs font-bold">
-                        {source.images.length > 9 ? '9+' : source.images.length}
+                        {imageCount(source) > 9 ? '9+' : imageCount(source)}
                       </div>
                     )}
                   </div>
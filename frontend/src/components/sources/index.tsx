@@ -26,15 +26,18 @@ interface SourcesManagerProps {
 const SelectableImage = ({ 
   sourceName, 
   imageName, 
+  version,
   isSelected, 
   onSelect 
 }: { 
   sourceName: string;
   imageName: string;
+  version?: string;
   isSelected: boolean;
   onSelect: (imageName: string) => void;
 }) => {
-  const imageUrl = `${API_URL}/uploads/sources/${sourceName}/${imageName}`;
+  const query = version ? `?v=${version.slice(0, 16)}` : '';
+  const thumbnailUrl = (size: number) => `${API_URL}/thumbnails/${sourceName}/${size}/${imageName}${query}`;
 
   return (
     <div className="relative group aspect-square">
@@ -44,7 +47,14 @@ const SelectableImage = ({
           isSelected ? 'border-primary-500' : 'border-transparent group-hover:border-primary-200'
         } focus:outline-none focus:ring-2 focus:ring-primary-200`}
       >
-        <img src={imageUrl} alt={imageName} loading="lazy" className="w-full h-full object-cover" />
+        <img
+          src={thumbnailUrl(320)}
+          srcSet={`${thumbnailUrl(160)} 160w, ${thumbnailUrl(320)} 320w, ${thumbnailUrl(640)} 640w`}
+          sizes="(min-width: 1280px) 16vw, (min-width: 768px) 25vw, 50vw"
+          alt={imageName}
+          loading="lazy"
+          className="w-full h-full object-cover"
+        />
       </button>
       <div
         className={`absolute top-2 right-2 p-1.5 rounded-full transition-all duration-200 ${
@@ -264,6 +274,7 @@ export default function SourcesManager({ selectedSource, onSourceUpdate }: Sourc
                 key={imageName}
                 sourceName={selectedSource}
                 imageName={imageName}
+                version={source.files?.[imageName]?.sha256}
                 isSelected={selectedImages.includes(imageName)}
                 onSelect={handleSelectImage}
               />
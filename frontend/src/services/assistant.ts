@@ -1,5 +1,6 @@
+import { API_URL } from "@/config"
 import { callApi } from "@/utils/api"
-import { AssistantResponse, ChatHistoryResponse } from "@/types/assistant"
+import { AssistantResponse, AssistantStreamEvent, ChatHistoryResponse } from "@/types/assistant"
 
 export const askAssistant = async (sourceName: string, text: string = "", files: File[] = [], previousAmbiguities: string = "", ambiguitiesResponse: string = ""): Promise<AssistantResponse> => {
   const formData = new FormData()
@@ -21,6 +22,65 @@ export const askAssistant = async (sourceName: string, text: string = "", files:
   return res as AssistantResponse
 }
 
+export const askAssistantStream = async (sourceName: string, text: string = "", files: File[] = [], onEvent: (event: AssistantStreamEvent) => void): Promise<void> => {
+  const formData = new FormData()
+
+  if (text) {
+    formData.append('text', text)
+  }
+
+  files.forEach(file => {
+    formData.append('file', file)
+  })
+
+  const res = await fetch(`${API_URL}/assistant/${sourceName}/ask/stream/`, {
+    method: 'POST',
+    body: formData,
+  })
+
+  if (!res.ok || !res.body) {
+    let errorMessage = 'An unknown error occurred.'
+    try {
+      const errorData = await res.json()
+      errorMessage = errorData.error || errorData.message || JSON.stringify(errorData)
+    } catch (e) {
+      errorMessage = await res.text()
+    }
+    throw new Error(`API call failed: ${errorMessage}`)
+  }
+
+  const reader = res.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+
+    let boundary = buffer.indexOf('\n\n')
+    while (boundary !== -1) {
+      const rawEvent = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+      boundary = buffer.indexOf('\n\n')
+
+      let eventName = 'message'
+      const dataLines: string[] = []
+      rawEvent.split('\n').forEach(line => {
+        if (line.startsWith('event:')) eventName = line.slice(6).trim()
+        else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim())
+      })
+      if (dataLines.length === 0) continue
+
+      const event = { event: eventName, data: JSON.parse(dataLines.join('\n')) } as AssistantStreamEvent
+      if (event.event === 'error') {
+        throw new Error(event.data.error)
+      }
+      onEvent(event)
+    }
+  }
+}
+
 export const getChatHistory = async (sourceName: string): Promise<ChatHistoryResponse> => {
   const res = await callApi(`/assistant/${sourceName}/history`)
   return res as ChatHistoryResponse
@@ -3,8 +3,14 @@ import { Source } from "@/types/source"
 import { callApi } from "@/utils/api"
 
 export const fetchSources = async (): Promise<Source[]> => {
-  const res = await callApi('/source')
-  return res.sources as Source[]
+  const sources: Source[] = []
+  let after: string | null = ''
+  while (after !== null) {
+    const res = await callApi(`/source?limit=500&after=${encodeURIComponent(after)}`)
+    res.sources.forEach((source: Source) => sources.push({ ...source, images: source.images ?? [] }))
+    after = res.next_cursor
+  }
+  return sources
 }
 
 export const createSource = async (sourceName: string): Promise<Source> => {
@@ -24,33 +30,25 @@ export const fetchSource = async(sourceName: string): Promise<Source> => {
   return res as Source
 }
 
-export const uploadSource = async (sourceName: string, files: File[]): Promise<void> => {
-    const uploadPromises = files.map(file => {
-        const formData = new FormData();
-        formData.append('file', file);
-        return callApi(`/source/${sourceName}/upload`, {
-            method: 'POST',
-            noDefaultHeader: true,
-            body: formData,
-        });
-    });
-
-    const results = await Promise.allSettled(uploadPromises);
-
-    const failedUploads = results.filter(result => result.status === 'rejected') as PromiseRejectedResult[];
-
-    if (failedUploads.length > 0) {
-        const failedFilesCount = failedUploads.length;
-        const totalFilesCount = files.length;
-        const successCount = totalFilesCount - failedFilesCount;
-
-        failedUploads.forEach(fail => {
-            console.error('Upload failed with reason:', fail.reason);
-        });
+export interface BulkUploadResponse {
+    message: string
+    job_id: string
+    status: string
+    status_url: string
+    files: string[]
+    rejected: string[]
+}
 
-        throw new Error(`Upload partially failed. ${successCount}/${totalFilesCount} files succeeded. Please try the remaining ${failedFilesCount} again.`);
-    }
+export const uploadSource = async (sourceName: string, files: File[]): Promise<BulkUploadResponse> => {
+    const formData = new FormData();
+    files.forEach(file => formData.append('file', file));
 
+    const res = await callApi(`/source/${sourceName}/upload/bulk`, {
+        method: 'POST',
+        noDefaultHeader: true,
+        body: formData,
+    });
+    return res as BulkUploadResponse;
 };
 
 export const deleteSource = async (sourceName: string, imageNames: string[]): Promise<void> => {
@@ -34,12 +34,37 @@ export interface AssistantResponse {
 }
 
 export interface ChatHistoryEntry {
+    id?: number
     user: string
     assistant: string
+    created_at?: number
 }
 
 export interface ChatHistoryResponse {
     source_name: string
     history: ChatHistoryEntry[]
+    next_cursor?: number | null
     total_exchanges: number
 }
+
+export interface AssistantProgress {
+    completed_batches: number
+    total_batches: number
+    answered_questions: number
+    total_questions: number
+}
+
+export interface AssistantBatch {
+    batch_index: number
+    section: string
+    question_indices: number[]
+    answers: AssistantQuestion[]
+}
+
+export type AssistantStreamEvent =
+    | { event: "status", data: { message: string } }
+    | { event: "questions_detected", data: { total_questions: number, sections: string[] } }
+    | { event: "progress", data: AssistantProgress }
+    | { event: "batch", data: AssistantBatch }
+    | { event: "done", data: AssistantResponse }
+    | { event: "error", data: { error: string } }
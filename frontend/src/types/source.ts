@@ -1,4 +1,14 @@
+export interface SourceFile {
+    size: number
+    sha256: string
+    ocr: boolean
+    indexed: boolean
+}
+
 export interface Source {
     name: string
     images: string[]
+    image_count?: number
+    version?: number
+    files?: Record<string, SourceFile>
 }
\ No newline at end of file
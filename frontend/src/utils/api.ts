@@ -4,7 +4,8 @@ interface CallApiOptions extends RequestInit {
     noDefaultHeader?: boolean
 }
 export const callApi = async (route: string, {noDefaultHeader, ...options}: CallApiOptions = { noDefaultHeader: false }) => {
-    const res = await fetch(`${API_URL}${route}/`, {
+    const [path, query] = route.split('?')
+    const res = await fetch(`${API_URL}${path}/${query ? `?${query}` : ''}`, {
         ...options,
         headers: noDefaultHeader ? options.headers : {
             "Content-Type": "application/json",